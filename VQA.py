@@ -1,28 +1,84 @@
+import time
+
+# 启动计时的起点，--startup-timing 时报告导入、第一个窗口和第一张图像的耗时
+STARTED_AT = time.perf_counter()
+
+import argparse
+import importlib
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog
 import os
-import cv2
-from PIL import Image, ImageTk
-import re
+from concurrent.futures import ThreadPoolExecutor
 from setting import save_settings, load_settings
+from annotation_store import open_store, STORAGE_BACKENDS
+from image_index import ImageIndex
+from background_writer import BackgroundWriter
+from perf import SpanRecorder, StartupTimer, configure_logging, logger
+
+IMPORTED_AT = time.perf_counter()
 
-def natural_sort_key(s):
-    # 使用正则表达式分割字符串中的数字部分和非数字部分
-    return [int(text) if text.isdigit() else text.lower() for text in re.split('([0-9]+)', s)]
+# 多人标注时通过 annotation_server.py 读写标注
+SERVER_BACKEND = "server"
+# 标注窗口用到的模块（cv2、PIL、numpy 等）较慢，在路径选择窗口显示后于后台线程中导入
+BACKGROUND_IMPORTS = ("annotation_window", "remote_store")
 
 class AnnotationApp(tk.Tk):
-    def __init__(self):
+    def __init__(self, perf=None, startup=None):
         super().__init__()
         self.title("RoadSide-VQA+VG 标注软件")
-        self.geometry("800x300")
+        self.geometry("800x350")
         # 初始化变量
         self.rope3d_path = None
         self.image_folder = None
         self.annotation_window = None
-        self.image_files = []  # 图片文件列表
+        self.annotation_store = None
+        # 图像文件夹的索引在后台读取或扫描，标注窗口在索引准备好之前也可以打开单张图像
+        self.index_future = None
+        self.index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-index")
+        self.settings = {}  # 当前设置，只在启动时从文件读取一次
+        # 设置和标注都在后台线程中写入
+        self.writer = BackgroundWriter()
+        # 各步骤的耗时统计，标注窗口中按 F2 显示
+        self.perf = perf or SpanRecorder()
+        # --startup-timing 时记录各阶段的启动耗时
+        self.startup = startup
 
         self.setup_ui()  # 确保先调用 setup_ui 来创建所有 UI 组件
         self.load_user_settings()  # 然后加载用户设置
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.check_write_errors()
+        threading.Thread(target=self.import_in_background, name="imports", daemon=True).start()
+        if self.startup is not None:
+            self.bind("<Map>", self.on_first_map)
+
+    def import_in_background(self):
+        """路径选择窗口显示期间导入标注窗口的模块，点击确定时不用再等待"""
+        for name in BACKGROUND_IMPORTS:
+            importlib.import_module(name)
+        if self.startup is not None:
+            self.startup.mark("background_imports")
+
+    def on_first_map(self, event):
+        if event.widget is not self:
+            return
+        self.unbind("<Map>")
+        self.startup.mark("first_window")
+        # 等窗口画出来之后再用保存的设置打开标注窗口
+        self.after(1, self.run_startup_timing)
+
+    def run_startup_timing(self):
+        """--startup-timing：用保存的设置打开标注窗口并加载上次的图像，输出各阶段耗时后退出"""
+        self.start_and_save_settings()
+        window = self.annotation_window
+        if window is not None:
+            self.startup.mark("annotation_window")
+            window.load_image()
+            window.update_idletasks()
+            if window.image is not None:
+                self.startup.mark("first_image")
+        print(self.startup.report())
+        self.on_close()
 
     def setup_ui(self):
         self.rope3d_path_label = tk.Label(self, text="Rope3D数据集路径:")
@@ -41,37 +97,72 @@ class AnnotationApp(tk.Tk):
         self.image_folder_browse_button = tk.Button(self, text="浏览", command=lambda: self.browse_directory(self.image_folder_entry))
         self.image_folder_browse_button.grid(row=1, column=2, padx=10, pady=10)
 
+        # 标注存储方式：txt 为原来的三个文件夹，sqlite 为单个数据库文件，server 为多人共用的标注服务
+        self.storage_backend_label = tk.Label(self, text="标注存储方式:")
+        self.storage_backend_label.grid(row=2, column=0, padx=10, pady=10, sticky="e")
+        self.storage_backend_var = tk.StringVar(self, value=STORAGE_BACKENDS[0])
+        self.storage_backend_menu = tk.OptionMenu(self, self.storage_backend_var, *STORAGE_BACKENDS, SERVER_BACKEND)
+        self.storage_backend_menu.grid(row=2, column=1, padx=10, pady=10, sticky="w")
+
+        self.server_url_label = tk.Label(self, text="标注服务地址:")
+        self.server_url_label.grid(row=3, column=0, padx=10, pady=10, sticky="e")
+        self.server_url_entry = tk.Entry(self, width=50)
+        self.server_url_entry.grid(row=3, column=1, padx=10, pady=10)
+
         #在启动标注之前保存设置
         self.confirm_button = tk.Button(self, text="确定", command=self.start_and_save_settings)
-        self.confirm_button.grid(row=2, column=1, pady=20)
+        self.confirm_button.grid(row=4, column=1, pady=20)
 
     def save_user_settings(self):
-        current_settings = load_settings()
-        if current_settings.get("last_file_name") != "":
-            """保存用户的设置"""
-            settings = {
-                'rope3d_path': self.rope3d_path_entry.get(),
-                'image_folder': self.image_folder_entry.get(),
-                'last_file_name': current_settings.get("last_file_name")
-            }
-        else:
-            settings = {
-                'rope3d_path': self.rope3d_path_entry.get(),
-                'image_folder': self.image_folder_entry.get(),
-                'last_file_name': self.annotation_window.file_name if self.annotation_window else "None"
-            }
-        print(settings)
-        save_settings(settings)
+        """保存用户的设置"""
+        self.settings.update({
+            'rope3d_path': self.rope3d_path_entry.get(),
+            'image_folder': self.image_folder_entry.get(),
+            'storage_backend': self.storage_backend_var.get(),
+            'server_url': self.server_url_entry.get().strip()
+        })
+        if not self.settings.get("last_file_name"):
+            self.settings['last_file_name'] = self.annotation_window.file_name if self.annotation_window else "None"
+        logger.debug("设置: %s", self.settings)
+        self.queue_settings_save()
+
+    def queue_settings_save(self):
+        """在后台写入 settings.json，连续多次修改只写最后一次"""
+        self.writer.submit(save_settings, dict(self.settings), key="settings", description="settings.json")
+
+    def check_write_errors(self):
+        """定期检查后台写入是否失败，并提示用户"""
+        for description, error in self.writer.pop_errors():
+            messagebox.showerror("错误", f"保存失败 {description}: {error}")
+        self.after(500, self.check_write_errors)
+
+    def on_close(self):
+        """退出前关闭标注窗口（自动保存修改、释放租约），并等待后台写入完成"""
+        self.close_annotation_window()
+        self.writer.close()
+        for description, error in self.writer.pop_errors():
+            messagebox.showerror("错误", f"保存失败 {description}: {error}")
+        if self.annotation_store is not None:
+            self.annotation_store.close()
+        self.index_executor.shutdown(wait=False)
+        self.perf.close()
+        self.destroy()
 
     def load_user_settings(self):
         """加载用户的设置"""
         settings = load_settings()
+        self.settings = settings
         # 清空输入框，并插入最新的设置值
         self.rope3d_path_entry.delete(0, tk.END)
         self.rope3d_path_entry.insert(0, settings.get('rope3d_path', ''))
 
         self.image_folder_entry.delete(0, tk.END)
         self.image_folder_entry.insert(0, settings.get('image_folder', ''))
+
+        self.storage_backend_var.set(settings.get('storage_backend', STORAGE_BACKENDS[0]))
+
+        self.server_url_entry.delete(0, tk.END)
+        self.server_url_entry.insert(0, settings.get('server_url', ''))
         return settings
     
     def start_and_save_settings(self):
@@ -87,20 +178,16 @@ class AnnotationApp(tk.Tk):
             messagebox.showerror("错误", "提供的路径无效")
             return
         
-         # 加载图像文件夹中的所有图像文件
+        # 在后台加载图像文件夹中的所有图像文件，没有图像时由标注窗口提示
         self.load_image_files(self.image_folder)
 
-        # 打开注释窗口
-        if self.image_files:
-            # 保存用户设置
-            self.save_user_settings()
-            # 创建必要的文件夹
-            self.create_folders(self.rope3d_path)
-            self.open_annotation_window()
-            
-        else:
-            messagebox.showerror("错误", "没有找到图像文件")
+        # 保存用户设置
+        self.save_user_settings()
+        # 打开标注存储（txt 方式会创建必要的文件夹）
+        if not self.open_annotation_store(self.rope3d_path):
             return False
+        # 打开注释窗口
+        self.open_annotation_window()
         
     def browse_directory(self, entry):
         directory = filedialog.askdirectory()
@@ -110,401 +197,56 @@ class AnnotationApp(tk.Tk):
     
 
     def load_image_files(self, directory):
-        """加载图像文件夹中的所有图像文件到列表"""
-        all_files = [os.path.join(directory, f) for f in os.listdir(directory)
-                    if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-        sorted_files = sorted(all_files, key=natural_sort_key)  # 确保文件按顺序加载
-        self.image_files = sorted_files
+        """在后台加载图像文件夹中的所有图像文件（文件夹没有变化时直接使用缓存的排序结果）"""
+        self.index_future = self.index_executor.submit(ImageIndex.load, directory)
 
 
-    def create_folders(self, rope3d_path):
-        # 获取Rope3D路径的父目录
+    def open_annotation_store(self, rope3d_path):
+        # 标注保存在Rope3D路径的父目录下
         parent_directory = os.path.dirname(rope3d_path)
-        
-        # 在父目录下创建必要的文件夹
-        for folder_name in ["Questions", "Answers", "Labels"]:
-            folder_path = os.path.join(parent_directory, folder_name)
-            if not os.path.exists(folder_path):
-                os.makedirs(folder_path)
+        backend = self.storage_backend_var.get()
+        if backend == SERVER_BACKEND:
+            from remote_store import RemoteAnnotationStore
+            store = RemoteAnnotationStore(self.server_url_entry.get().strip())
+            try:
+                store.ping()
+            except (OSError, ValueError) as e:
+                messagebox.showerror("错误", f"无法连接标注服务 {store.server_url}: {e}")
+                return False
+        if self.annotation_store is not None:
+            # 已打开的标注窗口还在使用旧的存储，先关闭它（会自动保存修改），之后用新的存储重新打开
+            self.close_annotation_window()
+            self.writer.flush()
+            self.annotation_store.close()
+        self.annotation_store = store if backend == SERVER_BACKEND else open_store(parent_directory, backend)
+        return True
+
+    def close_annotation_window(self):
+        if self.annotation_window is not None and self.annotation_window.winfo_exists():
+            self.annotation_window.on_close()
+        self.annotation_window = None
 
     def open_annotation_window(self):
         if self.annotation_window is None or not self.annotation_window.winfo_exists():
-            self.annotation_window = AnnotationWindow(self, self.image_folder, self.rope3d_path, self.image_files)
-
-class AnnotationWindow(tk.Toplevel):
-    def __init__(self, parent, image_folder, rope3d_path, image_files):
-        super().__init__(parent)
-        self.title("标注窗口")
-        self.geometry("1920x1080")
-        self.parent = parent
-        self.image_folder = image_folder  # 存储传递的 image_folder
-        self.rope3d_path = rope3d_path  # 存储传递的 rope3d_folder
-        self.image_files = image_files  # 存储传递的图像文件列表
-        print(f"初始化 AnnotationWindow: {len(image_files)} 张图片加载")
-
-        self.current_index = 0  # 当前图像的索引
-        
-        self.image = None
-        self.bboxes = []
-        self.selected_bboxes = []
-        self.file_name = None
-
-        self.setup_ui()
-
-    def setup_ui(self):
-        top_frame = tk.Frame(self)
-        top_frame.pack(fill="x", pady=10)
-
-        self.file_name_label = tk.Label(top_frame, text="输入文件名(不带后缀):")
-        self.file_name_label.pack(side="left", padx=(10, 2))
-
-        self.file_name_entry = tk.Entry(top_frame, width=70)
-        self.file_name_entry.pack(side="left", padx=(0, 10), fill="x", expand=True)
-
-        self.load_button = tk.Button(top_frame, text="加载图像", command=self.load_image)
-        self.load_button.pack(side="right", padx=(0, 10))
-        self.browse_button = tk.Button(top_frame, text="浏览", command=self.browse_image)
-        self.browse_button.pack(side="right", padx=(0, 10))
-
-        # 如果主界面有保存的文件名，则加载它
-        if self.parent:
-            settings = self.parent.load_user_settings()
-            last_file_name = settings.get('last_file_name', '')
-            if last_file_name:  # 确保文件名不是 None 或空字符串
-                self.file_name_entry.insert(0, last_file_name)
-            
-        # 输入问题的容器
-        question_frame = tk.Frame(self)
-        question_frame.pack(fill="x", pady=(5, 0))
-        self.question_label = tk.Label(question_frame, text="输入问题:")
-        self.question_label.pack(side="left", padx=(10, 2))
-        self.question_entry = tk.Text(question_frame, height=2, width=87)
-        self.question_entry.pack(side="left", fill="x", expand=True)
-
-        # 输入答案的容器
-        answer_frame = tk.Frame(self)
-        answer_frame.pack(fill="x", pady=(5, 0))
-        self.answer_label = tk.Label(answer_frame, text="输入答案:")
-        self.answer_label.pack(side="left", padx=(10, 2))
-        self.answer_entry = tk.Text(answer_frame, height=2, width=87)
-        self.answer_entry.pack(side="left", fill="x", expand=True)
-
-        self.save_button = tk.Button(self, text="保存标注", command=self.save_annotation)
-        self.save_button.pack(pady=(10, 20))
-
-        # 创建一个Frame来放置按钮
-        button_frame = tk.Frame(self)
-        button_frame.pack(side="top", fill="x", padx=10, pady=10)
-
-        self.prev_button = tk.Button(button_frame, text="上一个", command=self.prev_image)
-        self.prev_button.pack(side="left", padx=10)
-
-        self.next_button = tk.Button(button_frame, text="下一个", command=self.next_image)
-        self.next_button.pack(side="right", padx=10)
-
-        self.image_canvas = tk.Canvas(self, width=1920, height=1080)
-        self.image_canvas.pack(pady=(0, 20))
-        self.image_canvas.bind("<Button-1>", self.select_bbox)
-
-        # 状态标签
-        self.status_label = tk.Label(self, text="", fg="green", font=("Helvetica", "15", "bold"))
-        self.status_label.pack(side="bottom", fill="x")
-
-    def browse_image(self):
-        file_path = filedialog.askopenfilename(initialdir=self.image_folder,
-                                            title="选择图像",
-                                            filetypes=(("JPEG files", "*.jpg;*.jpeg"), ("PNG files", "*.png"), ("All files", "*.*")))
-        if file_path:
-            self.file_name_entry.delete(0, tk.END)
-            self.file_name_entry.insert(0, os.path.splitext(os.path.basename(file_path))[0])
-            self.focus_force()  # 重新获取焦点
-            self.load_image()  # 如果你想加载图像，可以直接调用 load_image 方法
-
-
-    #显示图片和标注的主要处理方法
-    def load_image(self):
-        self.selected_bboxes = []
-        self.file_name = self.file_name_entry.get().strip()  # 直接从输入框获取文件名
-        if not self.file_name:
-            messagebox.showerror("错误", "文件名不能为空")
-            return
-
-        # 构建图像的完整路径
-        image_path = os.path.join(self.image_folder, f"{self.file_name}.jpg")
-        if not os.path.exists(image_path):  # 检查文件是否存在
-            messagebox.showerror("错误", f"图像文件不存在: {image_path}")
-            return
-
-        # 更新当前索引
-        try:
-            self.current_index = self.image_files.index(image_path)
-        except ValueError:
-            messagebox.showerror("错误", "所选文件不在文件列表中")
-            return
-
-        # 清除画布上的所有内容
-        self.image_canvas.delete("all")
-
-        # 清除问题和答案输入框的内容
-        self.question_entry.delete("1.0", tk.END)
-        self.answer_entry.delete("1.0", tk.END)
-
-        # 加载图像
-        self.image = cv2.imread(image_path)
-        if self.image is not None:
-            self.display_image()
-            self.load_existing_annotations()  # 加载已有标注
-        else:
-            messagebox.showerror("错误", "无法加载图像")
-        
-        # 更新设置
-        self.save_current_settings()
-
-    def load_existing_annotations(self):
-        print("Attempting to load existing annotations...")
-        parent_directory = os.path.dirname(self.parent.rope3d_path)
-        parent_directory = os.path.dirname(self.parent.rope3d_path)
-        question_path = os.path.join(parent_directory, "Questions", f"{self.file_name}.txt")
-        answer_path = os.path.join(parent_directory, "Answers", f"{self.file_name}.txt")
-        label_path = os.path.join(parent_directory, "Labels", f"{self.file_name}.txt")
-
-        # 加载问题
-        if os.path.exists(question_path):
-            with open(question_path, 'r') as q_file:
-                question = q_file.read().strip()
-                self.question_entry.insert("1.0", question)
-
-        # 加载答案
-        if os.path.exists(answer_path):
-            with open(answer_path, 'r') as a_file:
-                answer = a_file.read().strip()
-                self.answer_entry.insert("1.0", answer)        
-
-        if os.path.exists(label_path):
-            with open(label_path, 'r') as file:
-                self.selected_bboxes = []
-                for line in file:
-                    parts = line.strip().split()
-                    bbox_data = {
-                        "type": parts[0],
-                        "truncated": int(parts[1]),
-                        "occluded": int(parts[2]),
-                        "angle": float(parts[3]),
-                        "bbox2d": [float(parts[4]), float(parts[5]), float(parts[6]), float(parts[7])],
-                        "dimensions": [float(parts[8]), float(parts[9]), float(parts[10])],
-                        "position": [float(parts[11]), float(parts[12]), float(parts[13])],
-                        "rotation_y": float(parts[14])
-                    }
-                    self.selected_bboxes.append(bbox_data)
-                print("Loaded existing annotations.")
-                print(self.selected_bboxes)
-        self.redraw_bboxes()  # Redraw bounding boxes based on loaded data
-
-    def save_current_settings(self):
-        # 更新设置并保存到文件
-        settings = {
-            'rope3d_path': self.parent.rope3d_path_entry.get(),
-            'image_folder': self.parent.image_folder_entry.get(),
-            'last_file_name': self.file_name
-        }
-        save_settings(settings)
-
-    def display_image(self):
-    
-        # 确保画布尺寸已更新
-        self.update_idletasks()
-        canvas_width = self.image_canvas.winfo_width()
-        canvas_height = self.image_canvas.winfo_height()
-
-        # 转换图像色彩空间
-        image = cv2.cvtColor(self.image, cv2.COLOR_BGR2RGB)
-        image_pil = Image.fromarray(image)
-
-        # 保持宽高比调整图像大小
-        original_width, original_height = image_pil.size
-        self.scale_x = canvas_width / original_width
-        self.scale_y = canvas_height / original_height
-
-        new_width = int(original_width * self.scale_x)
-        new_height = int(original_height * self.scale_y)
-        image_pil = image_pil.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-        # 创建PhotoImage并居中显示
-        self.photo_image = ImageTk.PhotoImage(image_pil)
-        self.image_canvas.create_image(canvas_width // 2, canvas_height // 2, image=self.photo_image, anchor=tk.CENTER)
-
-        # 加载边界框
-        self.load_bboxes()
-        self.draw_bboxes()  # 在调整图像大小后绘制边界框
-     
-    def load_bboxes(self):
-        bboxes = []
-        
-        label_file = os.path.join(self.parent.rope3d_path, f"{self.file_name}.txt")
-        print("Attempting to load bboxes from:", label_file)
-        if os.path.exists(label_file):
-            with open(label_file, 'r') as file:
-                for line in file:
-                    parts = line.strip().split()
-                    if len(parts) >= 14: 
-                        bbox_data = {
-                            "type": parts[0],
-                            "truncated": int(parts[1]),
-                            "occluded": int(parts[2]),
-                            "angle": float(parts[3]),
-                            "bbox2d": [float(parts[4]), float(parts[5]), float(parts[6]), float(parts[7])],
-                            "dimensions": [float(parts[8]), float(parts[9]), float(parts[10])],
-                            "position": [float(parts[11]), float(parts[12]), float(parts[13])],
-                            "rotation_y": float(parts[14])
-                        }
-                        bboxes.append(bbox_data)
-                    print(f"已添加框{bbox_data['type']}到bboxes列表")
-        else:
-            print("Label file does not exist:", label_file)
-            messagebox.showerror("错误", "Labels文件夹中没有对应label，请检查路径设置")
-
-        if bboxes:
-            print("Loaded bboxes.")
-        else:
-            print("No bboxes loaded.")
-        self.bboxes = bboxes  # 确保始终设置self.bboxes，即使为空列表
-
-    def draw_bboxes(self):
-        print("Attempting to draw bounding boxes...")
-        if not self.bboxes:
-            print("No bounding boxes to draw.")
-            return
-
-        self.image_canvas.delete("bbox")
-
-        for bbox in self.bboxes:
-            x1, y1, x2, y2 = [bbox['bbox2d'][i] * (self.scale_x if i % 2 == 0 else self.scale_y) for i in range(4)]
-            bbox_text = f"{bbox['type']}"  
-            text_x = x1 + 10
-            text_y = y1 + 10
-
-            self.image_canvas.create_rectangle(x1, y1, x2, y2, outline="blue", width=2, tags="bbox")
-            self.image_canvas.create_text(text_x, text_y, text=bbox_text, fill="blue", font=("Helvetica", "10", "bold"), tags="bbox")
-
-        self.image_canvas.update()
-
-    def select_bbox(self, event):
-        x, y = event.x, event.y
-        found = False
-        for bbox in self.bboxes:
-            x1, y1, x2, y2 = [int(bbox['bbox2d'][i] * (self.scale_x if i % 2 == 0 else self.scale_y)) for i in range(4)]
-            if x1 <= x <= x2 and y1 <= y <= y2:
-                if bbox in self.selected_bboxes:
-                    self.selected_bboxes.remove(bbox)  # 如果已选中，则取消选择
-                else:
-                    self.selected_bboxes.append(bbox)  # 否则添加到选择列表中
-                found = True
-                break
-        if found:
-            self.redraw_bboxes()
-
-    def redraw_bboxes(self):
-        # 重绘边界框，并根据是否被选中改变边框颜色
-        self.image_canvas.delete("bbox")
-        for bbox in self.bboxes:
-            x1, y1, x2, y2 = [int(bbox['bbox2d'][i] * (self.scale_x if i % 2 == 0 else self.scale_y)) for i in range(4)]
-            box_color = "yellow" if bbox in self.selected_bboxes else "blue"
-            text_color = "yellow" if bbox in self.selected_bboxes else "blue"
-            bbox_text = f"{bbox['type']}"
-            text_x = x1 + 10
-            text_y = y1 + 10
-            self.image_canvas.create_rectangle(x1, y1, x2, y2, outline=box_color, width=2, tags="bbox")
-            self.image_canvas.create_text(text_x, text_y, text=bbox_text, fill=text_color, font=("Helvetica", "10", "bold"), tags="bbox")
-
-        # 显式更新画布以反映变更
-        self.image_canvas.update()
-
-    def save_annotation(self):
-        if not self.file_name:
-            messagebox.showerror("错误", "文件名不能为空。")
-            return
-        if not self.selected_bboxes:
-            # 弹出确认对话框
-            response = messagebox.askyesno("确认", "没有选中任何边界框，是否继续保存空标注？")
-            if not response:
-                return  # 用户选择不保存，直接返回
-
-        question = self.question_entry.get("1.0", tk.END).strip()
-        answer = self.answer_entry.get("1.0", tk.END).strip()
-
-        if not question:
-            messagebox.showerror("错误", "问题不能为空。")
-            return
-        if not answer:
-            messagebox.showerror("错误", "答案不能为空。")
-            return
+            from annotation_window import AnnotationWindow
+            self.annotation_window = AnnotationWindow(self, self.image_folder, self.rope3d_path, self.index_future,
+                                                      self.annotation_store)
 
-        parent_directory = os.path.dirname(self.parent.rope3d_path)
-        question_path = os.path.join(parent_directory, "Questions", f"{self.file_name}.txt")
-        answer_path = os.path.join(parent_directory, "Answers", f"{self.file_name}.txt")
-        label_path = os.path.join(parent_directory, "Labels", f"{self.file_name}.txt")
-
-        # 确保目录存在
-        os.makedirs((os.path.dirname(question_path)), exist_ok=True)
-        os.makedirs((os.path.dirname(answer_path)), exist_ok=True)
-        os.makedirs((os.path.dirname(label_path)), exist_ok=True)
-
-        # 写入问题和答案，每次保存都覆盖旧数据
-        with open(question_path, "w") as q_file:
-            q_file.write(question + "\n")
-        with open(answer_path, "w") as a_file:
-            a_file.write(answer + "\n")
-
-        # 清空标签文件，然后写入当前会话的所有边界框
-        with open(label_path, "w") as l_file:
-            for bbox in self.selected_bboxes:
-                bbox_data = [
-                    bbox["type"],
-                    bbox["truncated"],
-                    bbox["occluded"],
-                    bbox["angle"],
-                    *bbox["bbox2d"],
-                    *bbox["dimensions"],
-                    *bbox["position"],
-                    bbox["rotation_y"]
-                ]
-                l_file.write(" ".join(map(str, bbox_data)) + "\n")
-
-        self.status_label.config(text="标注已成功保存！")
-        self.status_label.place(relx=0.5, rely=0.5, anchor="center")
-        self.after(3000, self.clear_status_message)  # 3秒后清除状态消息
-
-    def clear_status_message(self):
-        """清除状态消息"""
-        self.status_label.config(text="")
-        self.status_label.place_forget()  # 可以使用 place_forget 来隐藏标签
-
-
-
-
-    def prev_image(self):
-        if len(self.image_files) > 0:
-            self.current_index = (self.current_index - 1) % len(self.image_files)
-            self.update_image_entry()
-            self.load_image()
-        else:
-            print("错误：没有图片可切换到上一张。")
-
-    def next_image(self):
-        if len(self.image_files) > 0:
-            self.current_index = (self.current_index + 1) % len(self.image_files)
-            self.update_image_entry()
-            self.load_image()
-        else:
-            print("错误：没有图片可切换到下一张。")
-
-    def update_image_entry(self):
-        """更新输入框以反映当前索引的图像文件名"""
-        current_file = os.path.basename(self.image_files[self.current_index])
-        current_file_name = os.path.splitext(current_file)[0]  # 去掉扩展名
-        self.file_name_entry.delete(0, tk.END)
-        self.file_name_entry.insert(0, current_file_name)
 
 if __name__ == "__main__":
-    app = AnnotationApp()
+    arg_parser = argparse.ArgumentParser(description="RoadSide-VQA+VG 标注软件")
+    arg_parser.add_argument("--log-level", default="WARNING",
+                            help="调试输出级别（DEBUG/INFO/WARNING），默认只输出警告和错误")
+    arg_parser.add_argument("--perf-log", help="把每次计时追加到这个 .csv 或 .jsonl 文件")
+    arg_parser.add_argument("--startup-timing", action="store_true",
+                            help="用保存的设置打开上次的图像，输出导入、第一个窗口和第一张图像的耗时后退出")
+    args = arg_parser.parse_args()
+    configure_logging(args.log_level)
+
+    perf = SpanRecorder(log_path=args.perf_log)
+    startup = None
+    if args.startup_timing:
+        startup = StartupTimer(STARTED_AT, perf)
+        startup.mark("imports", IMPORTED_AT)
+    app = AnnotationApp(perf, startup)
     app.mainloop()
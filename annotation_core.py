@@ -0,0 +1,96 @@
+import numpy as np
+
+from bbox_select import scale_boxes, transform_boxes, hit_test, boxes_in_rect, match_rows
+from label_store import LABEL_DTYPE
+
+
+class AnnotationSession:
+    """一张图像的框、选中状态和保存逻辑，不依赖 Tk
+
+    AnnotationWindow 只负责显示和输入，基准测试和脚本可以直接使用这个类。
+    坐标均为画布坐标，由 set_scale 或 set_view 从原图坐标换算。
+    """
+
+    def __init__(self, label_store, annotation_store):
+        self.label_store = label_store
+        self.annotation_store = annotation_store
+        self.file_name = None
+        self.bboxes = np.empty(0, dtype=LABEL_DTYPE)  # 当前图像的全部标签
+        self.box_coords = np.empty((0, 4))  # 缩放到画布坐标的 (N,4) 框坐标
+        self.selected_mask = np.zeros(0, dtype=bool)  # 与 bboxes 对应的选中状态
+        self.extra_selected = np.empty(0, dtype=LABEL_DTYPE)  # 已保存但在数据集标签中找不到的框
+        self.saved_state = None  # 加载或保存后的 (问题, 答案, 选中状态)，用于判断是否有未保存的修改
+
+    def begin(self, file_name):
+        """切换到另一张图像，清除选中状态"""
+        self.file_name = file_name
+        self.saved_state = None
+        self.selected_mask = np.zeros(len(self.bboxes), dtype=bool)
+        self.extra_selected = np.empty(0, dtype=LABEL_DTYPE)
+
+    def load_labels(self):
+        """读取数据集标签，返回标签文件是否存在"""
+        # 目录有变化时才增量更新，查找本身只是一次数组切片
+        self.label_store.refresh()
+        rows = self.label_store.get(self.file_name)
+        self.bboxes = np.empty(0, dtype=LABEL_DTYPE) if rows is None else rows
+        self.box_coords = np.empty((0, 4))
+        self.selected_mask = np.zeros(len(self.bboxes), dtype=bool)
+        return rows is not None
+
+    def set_scale(self, scale_x, scale_y):
+        # 每张图像只缩放一次，点击和重绘都直接使用画布坐标
+        self.box_coords = scale_boxes(self.bboxes["bbox2d"], scale_x, scale_y)
+
+    def set_view(self, zoom, offset_x, offset_y):
+        """缩放或平移视图后重新计算画布坐标，参数与 Viewport 相同"""
+        self.box_coords = transform_boxes(self.bboxes["bbox2d"], zoom, offset_x, offset_y)
+
+    def load_annotation(self):
+        """读取已保存的标注并恢复选中状态，没有标注时返回 None"""
+        annotation = self.annotation_store.load(self.file_name)
+        if annotation is not None and annotation.labels is not None:
+            self.selected_mask, self.extra_selected = match_rows(self.bboxes, annotation.labels)
+        return annotation
+
+    def toggle_at(self, x, y):
+        """切换包含该点的最小的框，返回框的索引，没有框时返回 None"""
+        indices = hit_test(self.box_coords, x, y)
+        if not len(indices):
+            return None
+        index = int(indices[0])
+        self.selected_mask[index] = not self.selected_mask[index]
+        return index
+
+    def select_in_rect(self, x0, y0, x1, y1):
+        """选中完全落在矩形内的所有框，返回这些框的索引"""
+        indices = boxes_in_rect(self.box_coords, x0, y0, x1, y1)
+        self.selected_mask[indices] = True
+        return indices
+
+    def set_selection(self, mask):
+        """用与 bboxes 对应的布尔数组替换选中状态（批量标注等脚本使用）"""
+        self.selected_mask = np.array(mask, dtype=bool)
+
+    def selected_rows(self):
+        """当前选中的框，包括数据集标签中找不到的已保存框"""
+        return np.concatenate([self.bboxes[self.selected_mask], self.extra_selected])
+
+    def state(self, question, answer):
+        return question, answer, self.selected_mask.tobytes(), len(self.extra_selected)
+
+    def mark_saved(self, question, answer):
+        self.saved_state = self.state(question, answer)
+
+    def mark_unsaved(self):
+        """后台保存失败时调用，再次保存成功之前一直算作有未保存的修改"""
+        self.saved_state = (None, None, None, None)
+
+    def is_dirty(self, question, answer):
+        """问题、答案或选中的框是否在加载/保存之后被修改过"""
+        return self.saved_state is not None and self.state(question, answer) != self.saved_state
+
+    def save(self, question, answer):
+        """同步写入存储"""
+        self.annotation_store.save(self.file_name, question, answer, self.selected_rows())
+        self.mark_saved(question, answer)
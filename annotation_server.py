@@ -0,0 +1,247 @@
+"""多人同时标注时使用的本地标注服务
+
+服务独占标注存储，标注程序通过 HTTP 读写（见 remote_store.py）:
+    - 每张图像有租约，租约期内其他人不能保存这张图像
+    - /claim 按顺序分配下一批没有标注、也没有被别人租用的图像
+    - 保存时带上读取时的版本号（内容哈希），期间被别人修改过则返回 409，不会覆盖
+
+    python annotation_server.py D:\\VQA\\validation\\label_2 --port 8765
+    python annotation_server.py D:\\VQA\\validation\\label_2 --backend sqlite --host 0.0.0.0
+
+接口（JSON）:
+    GET    /annotations/<name>           {"name", "question", "answer", "labels", "version"}
+    PUT    /annotations/<name>           {"client", "question", "answer", "labels", "base_version"}
+    POST   /claim                        {"client", "count"} -> {"names", "expires"}
+    POST   /leases/<name>                {"client"} -> {"expires"}，被别人租用时返回 423
+    DELETE /leases/<name>?client=<id>
+    GET    /names                        所有有标注的图像名
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from annotation_store import STORAGE_BACKENDS, open_store, format_labels
+from image_index import list_frames
+from label_store import parse_label_lines
+
+LEASE_SECONDS = 600
+DEFAULT_PORT = 8765
+
+
+def annotation_version(question, answer, labels_text):
+    """标注内容的哈希，作为乐观并发控制的版本号；没有标注时为 None"""
+    if question is None and answer is None and labels_text is None:
+        return None
+    data = json.dumps([question, answer, labels_text], ensure_ascii=False).encode('utf-8')
+    return hashlib.sha1(data).hexdigest()
+
+
+class ServiceError(Exception):
+    def __init__(self, status, payload):
+        super().__init__(payload.get("error"))
+        self.status = status
+        self.payload = payload
+
+
+class AnnotationService:
+    """租约、分配和带版本检查的保存；存储的访问由 _lock 串行化"""
+
+    def __init__(self, store, frames, lease_seconds=LEASE_SECONDS):
+        self.store = store
+        self.frames = frames  # 按自然顺序排列的全部图像名
+        self._frame_set = set(frames)
+        self.lease_seconds = lease_seconds
+        self.leases = {}  # 图像名 -> (client, 到期时间)
+        self.annotated = set(store.names())
+        self._cursor = 0  # 分配时从这里开始查找，之前的图像都已标注
+        self._lock = threading.Lock()
+
+    def _read(self, name):
+        annotation = self.store.load(name)
+        if annotation is None:
+            return None, None, None
+        labels_text = None if annotation.labels is None else format_labels(annotation.labels)
+        return annotation.question, annotation.answer, labels_text
+
+    def _check_name(self, name):
+        """只允许数据集中的图像名，防止通过 ../ 等名字读写标注目录以外的文件"""
+        if name not in self._frame_set:
+            raise ServiceError(404, {"error": f"unknown frame: {name}"})
+
+    def _holder(self, name, now):
+        lease = self.leases.get(name)
+        if lease is None or lease[1] <= now:
+            return None
+        return lease[0]
+
+    def get(self, name):
+        self._check_name(name)
+        with self._lock:
+            question, answer, labels_text = self._read(name)
+            lease = self.leases.get(name)
+        return {"name": name, "question": question, "answer": answer, "labels": labels_text,
+                "version": annotation_version(question, answer, labels_text),
+                "leased_by": lease[0] if lease and lease[1] > time.time() else None}
+
+    def acquire(self, client, name):
+        self._check_name(name)
+        now = time.time()
+        with self._lock:
+            holder = self._holder(name, now)
+            if holder is not None and holder != client:
+                raise ServiceError(423, {"error": "locked", "holder": holder, "expires": self.leases[name][1]})
+            expires = now + self.lease_seconds
+            self.leases[name] = (client, expires)
+        return {"name": name, "expires": expires}
+
+    def release(self, client, name):
+        self._check_name(name)
+        with self._lock:
+            lease = self.leases.get(name)
+            if lease is not None and lease[0] == client:
+                del self.leases[name]
+        return {"name": name}
+
+    def claim(self, client, count):
+        """分配下一批没有标注、也没有被别人租用的图像，并为它们加上租约"""
+        now = time.time()
+        expires = now + self.lease_seconds
+        names = []
+        with self._lock:
+            # 开头连续的已标注图像以后不再检查
+            while self._cursor < len(self.frames) and self.frames[self._cursor] in self.annotated:
+                self._cursor += 1
+            for name in itertools.islice(self.frames, self._cursor, None):
+                if len(names) >= count:
+                    break
+                if name in self.annotated or self._holder(name, now) is not None:
+                    continue
+                self.leases[name] = (client, expires)
+                names.append(name)
+        return {"names": names, "expires": expires}
+
+    def save(self, client, name, question, answer, labels_text, base_version):
+        self._check_name(name)
+        now = time.time()
+        labels = None if labels_text is None else parse_label_lines(labels_text.splitlines())
+        with self._lock:
+            holder = self._holder(name, now)
+            if holder is not None and holder != client:
+                raise ServiceError(423, {"error": "locked", "holder": holder, "expires": self.leases[name][1]})
+            current = self._read(name)
+            current_version = annotation_version(*current)
+            if current_version != base_version:
+                raise ServiceError(409, {"error": "conflict", "version": current_version,
+                                         "question": current[0], "answer": current[1], "labels": current[2]})
+            self.store.save(name, question, answer, labels)
+            self.annotated.add(name)
+            # 保存同时续租
+            self.leases[name] = (client, now + self.lease_seconds)
+            version = annotation_version(*self._read(name))
+        return {"name": name, "version": version}
+
+    def names(self):
+        with self._lock:
+            return {"names": self.store.names()}
+
+
+class AnnotationRequestHandler(BaseHTTPRequestHandler):
+    service = None  # 由 make_server 设置
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length).decode('utf-8')) if length else {}
+
+    def _route(self, method):
+        url = urlsplit(self.path)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        query = parse_qs(url.query)
+        try:
+            if method == "GET" and parts == ["names"]:
+                return self._send(200, self.service.names())
+            if method == "GET" and parts == ["health"]:
+                return self._send(200, {"ok": True})
+            if len(parts) == 2 and parts[0] == "annotations":
+                if method == "GET":
+                    return self._send(200, self.service.get(parts[1]))
+                if method == "PUT":
+                    body = self._body()
+                    return self._send(200, self.service.save(body["client"], parts[1], body.get("question"),
+                                                             body.get("answer"), body.get("labels"),
+                                                             body.get("base_version")))
+            if method == "POST" and parts == ["claim"]:
+                body = self._body()
+                return self._send(200, self.service.claim(body["client"], int(body.get("count", 10))))
+            if len(parts) == 2 and parts[0] == "leases":
+                if method == "POST":
+                    return self._send(200, self.service.acquire(self._body()["client"], parts[1]))
+                if method == "DELETE":
+                    return self._send(200, self.service.release(query.get("client", [""])[0], parts[1]))
+            self._send(404, {"error": "not found"})
+        except ServiceError as e:
+            self._send(e.status, e.payload)
+        except (KeyError, ValueError) as e:
+            self._send(400, {"error": f"bad request: {e}"})
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+
+def make_server(service, host="127.0.0.1", port=DEFAULT_PORT):
+    """创建 HTTP 服务，port 为 0 时自动选择端口（server.server_address[1]）"""
+    handler = type("Handler", (AnnotationRequestHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多人标注时使用的本地标注服务")
+    parser.add_argument("rope3d_path", help="Rope3D 标签文件夹，标注保存在它的父目录下")
+    parser.add_argument("--backend", choices=STORAGE_BACKENDS, default="sqlite", help="标注的存储方式")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--lease", type=int, default=LEASE_SECONDS, help="租约时长（秒）")
+    args = parser.parse_args(argv)
+
+    root = os.path.dirname(os.path.normpath(args.rope3d_path))
+    store = open_store(root, args.backend)
+    service = AnnotationService(store, list_frames(args.rope3d_path), args.lease)
+    server = make_server(service, args.host, args.port)
+    print(f"标注服务已启动: http://{args.host}:{server.server_address[1]}  "
+          f"{len(service.frames)} 张图像，已标注 {len(service.annotated)} 张")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
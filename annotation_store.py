@@ -0,0 +1,330 @@
+"""标注的存储后端
+
+txt    每张图像在 Questions/Answers/Labels 下各一个 txt 文件（原来的格式）
+sqlite 所有标注存放在一个 annotations.db 文件中（WAL 模式）
+
+两种格式可以互相转换:
+    python annotation_store.py import D:\\VQA\\validation
+    python annotation_store.py export D:\\VQA\\validation
+"""
+import argparse
+import codecs
+import hashlib
+import locale
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from atomic_io import atomic_write_text
+
+STORAGE_BACKENDS = ("txt", "sqlite")
+DB_FILE_NAME = "annotations.db"
+FOLDER_NAMES = ("Questions", "Answers", "Labels")
+
+# question/answer 为字符串，labels 为 LABEL_DTYPE 结构化数组；缺失的部分为 None
+Annotation = namedtuple("Annotation", ["question", "answer", "labels"])
+
+
+# label_store（numpy）和 qa_index（multiprocessing）用到时才导入，标注程序启动时只需要 STORAGE_BACKENDS
+def parse_labels(lines):
+    from label_store import parse_label_lines
+    return parse_label_lines(lines)
+
+
+def format_labels(labels):
+    from label_store import format_label_row
+    return "".join(format_label_row(row) + "\n" for row in labels)
+
+
+def read_text_file(path):
+    """按 UTF-8 读取文本，失败时按系统默认编码（如 GBK）读取，都失败时抛出 UnicodeDecodeError
+
+    不替换无法解码的字符，避免乱码在保存或导入时被写回。
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError as e:
+        error = e
+    fallback = locale.getpreferredencoding(False)
+    if codecs.lookup(fallback).name != 'utf-8':
+        try:
+            return data.decode(fallback)
+        except UnicodeDecodeError:
+            pass
+    raise UnicodeDecodeError(error.encoding, error.object, error.start, error.end, f"{path}: {error.reason}")
+
+
+class AnnotationStore:
+    """标注存储接口，GUI 和 checker notebook 都通过它读写标注"""
+
+    def load(self, name):
+        """读取一张图像的标注，没有任何标注时返回 None"""
+        raise NotImplementedError
+
+    def save(self, name, question, answer, labels):
+        raise NotImplementedError
+
+    def save_many(self, items):
+        """批量保存 (name, question, answer, labels)"""
+        for item in items:
+            self.save(*item)
+
+    def names(self):
+        """所有有标注的图像名（不带后缀）"""
+        raise NotImplementedError
+
+    def iter_annotations(self):
+        for name in self.names():
+            annotation = self.load(name)
+            if annotation is not None:
+                yield name, annotation
+
+    def count_questions(self):
+        """返回 ({问题: 出现次数}, [(文件名, 错误信息)])"""
+        raise NotImplementedError
+
+    def find_by_question(self, question):
+        raise NotImplementedError
+
+    def replace_question(self, old_question, new_question):
+        """把内容等于 old_question 的问题替换为 new_question，返回被修改的图像名"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class TxtAnnotationStore(AnnotationStore):
+    """原来的 Questions/Answers/Labels 三个 txt 文件夹"""
+
+    def __init__(self, root):
+        self.root = root
+        self.question_dir, self.answer_dir, self.label_dir = (os.path.join(root, folder) for folder in FOLDER_NAMES)
+        # 创建必要的文件夹
+        for folder_path in (self.question_dir, self.answer_dir, self.label_dir):
+            os.makedirs(folder_path, exist_ok=True)
+        self._question_index = None
+        self._digests = {}  # 路径 -> (mtime_ns, size, 内容哈希)，避免重复读取未变化的文件
+
+    def _paths(self, name):
+        return (os.path.join(self.question_dir, f"{name}.txt"),
+                os.path.join(self.answer_dir, f"{name}.txt"),
+                os.path.join(self.label_dir, f"{name}.txt"))
+
+    @staticmethod
+    def _read_text(path):
+        if not os.path.exists(path):
+            return None
+        return read_text_file(path).strip()
+
+    def load(self, name):
+        question_path, answer_path, label_path = self._paths(name)
+        question = self._read_text(question_path)
+        answer = self._read_text(answer_path)
+        labels = None
+        if os.path.exists(label_path):
+            labels = parse_labels(read_text_file(label_path).splitlines())
+        if question is None and answer is None and labels is None:
+            return None
+        return Annotation(question, answer, labels)
+
+    def _disk_digest(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        cached = self._digests.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        with open(path, 'rb') as file:
+            digest = hashlib.sha1(file.read()).digest()
+        self._digests[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def _write_if_changed(self, path, text):
+        """内容哈希与磁盘上的文件相同时跳过写入，返回是否写入"""
+        data = text.encode('utf-8')
+        digest = hashlib.sha1(data).digest()
+        if self._disk_digest(path) == digest:
+            return False
+        atomic_write_text(path, text, newline='')
+        stat = os.stat(path)
+        self._digests[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        return True
+
+    def save(self, name, question, answer, labels):
+        question_path, answer_path, label_path = self._paths(name)
+        # 写入问题和答案，内容没有变化的文件不重写
+        self._write_if_changed(question_path, question + "\n")
+        self._write_if_changed(answer_path, answer + "\n")
+        if labels is not None:
+            self._write_if_changed(label_path, format_labels(labels))
+
+    def names(self):
+        names = set()
+        for folder_path in (self.question_dir, self.answer_dir, self.label_dir):
+            with os.scandir(folder_path) as entries:
+                names.update(entry.name[:-4] for entry in entries
+                             if entry.name.endswith(".txt") and entry.is_file())
+        return sorted(names)
+
+    def question_index(self):
+        """Questions 文件夹的倒排索引，每次使用前按 mtime 增量更新"""
+        if self._question_index is None:
+            from qa_index import QAIndex
+            self._question_index = QAIndex(self.question_dir)
+        self._question_index.update()
+        return self._question_index
+
+    def count_questions(self):
+        index = self.question_index()
+        return index.counts(), index.errors()
+
+    def find_by_question(self, question):
+        return [filename[:-4] for filename in self.question_index().lookup(question)]
+
+    def replace_question(self, old_question, new_question):
+        return [filename[:-4] for filename in self.question_index().replace(old_question, new_question)]
+
+
+class SqliteAnnotationStore(AnnotationStore):
+    """所有标注保存在一个 SQLite 文件里，写入在事务中完成"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS annotations (
+            name TEXT PRIMARY KEY,
+            question TEXT,
+            answer TEXT,
+            labels TEXT,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_annotations_question ON annotations (question);
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # 连接可能在后台线程中使用，由 _lock 保证串行访问
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+
+    def load(self, name):
+        with self._lock:
+            row = self._conn.execute("SELECT question, answer, labels FROM annotations WHERE name = ?",
+                                     (name,)).fetchone()
+        if row is None:
+            return None
+        question, answer, labels = row
+        if labels is not None:
+            labels = parse_labels(labels.splitlines())
+        return Annotation(question, answer, labels)
+
+    def save(self, name, question, answer, labels):
+        self.save_many([(name, question, answer, labels)])
+
+    def save_many(self, items):
+        rows = [(name, question, answer, None if labels is None else format_labels(labels), time.time())
+                for name, question, answer, labels in items]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO annotations (name, question, answer, labels, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET question = excluded.question, answer = excluded.answer, "
+                "labels = excluded.labels, updated_at = excluded.updated_at "
+                # 内容没有变化时不更新这一行
+                "WHERE question IS NOT excluded.question OR answer IS NOT excluded.answer "
+                "OR labels IS NOT excluded.labels",
+                rows)
+
+    def names(self):
+        with self._lock:
+            return [name for (name,) in self._conn.execute("SELECT name FROM annotations ORDER BY name")]
+
+    def iter_annotations(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT name, question, answer, labels FROM annotations ORDER BY name").fetchall()
+        for name, question, answer, labels in rows:
+            if labels is not None:
+                labels = parse_labels(labels.splitlines())
+            yield name, Annotation(question, answer, labels)
+
+    def count_questions(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question, COUNT(*) FROM annotations WHERE question IS NOT NULL GROUP BY question").fetchall()
+        return dict(rows), []
+
+    def find_by_question(self, question):
+        with self._lock:
+            rows = self._conn.execute("SELECT name FROM annotations WHERE question = ? ORDER BY name",
+                                      (question,)).fetchall()
+        return [name for (name,) in rows]
+
+    def replace_question(self, old_question, new_question):
+        with self._lock, self._conn:
+            rows = self._conn.execute("SELECT name FROM annotations WHERE question = ? ORDER BY name",
+                                      (old_question,)).fetchall()
+            self._conn.execute("UPDATE annotations SET question = ?, updated_at = ? WHERE question = ?",
+                               (new_question, time.time(), old_question))
+        return [name for (name,) in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_store(root, backend="txt"):
+    """root 为 Questions/Answers/Labels 所在的目录（即 Rope3D 路径的父目录）"""
+    if backend == "sqlite":
+        return SqliteAnnotationStore(os.path.join(root, DB_FILE_NAME))
+    if backend == "txt":
+        return TxtAnnotationStore(root)
+    raise ValueError(f"未知的存储方式: {backend}")
+
+
+def copy_annotations(source, target, batch_size=1000):
+    """把 source 中的所有标注复制到 target，返回复制的数量"""
+    count = 0
+    batch = []
+    for name, annotation in source.iter_annotations():
+        batch.append((name, annotation.question or "", annotation.answer or "", annotation.labels))
+        if len(batch) >= batch_size:
+            target.save_many(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        target.save_many(batch)
+        count += len(batch)
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="在 txt 和 sqlite 两种标注格式之间转换")
+    parser.add_argument("command", choices=["import", "export"],
+                        help="import: txt -> sqlite, export: sqlite -> txt")
+    parser.add_argument("root", help="Questions/Answers/Labels 所在的目录")
+    parser.add_argument("--db", help=f"SQLite 文件路径，默认为 root 下的 {DB_FILE_NAME}")
+    args = parser.parse_args(argv)
+
+    txt_store = TxtAnnotationStore(args.root)
+    sqlite_store = SqliteAnnotationStore(args.db or os.path.join(args.root, DB_FILE_NAME))
+    try:
+        if args.command == "import":
+            count = copy_annotations(txt_store, sqlite_store)
+        else:
+            count = copy_annotations(sqlite_store, txt_store)
+    except UnicodeDecodeError as e:
+        parser.exit(1, f"无法读取标注: {e}\n")
+    finally:
+        sqlite_store.close()
+    print(f"已复制 {count} 条标注")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,889 @@
+import os
+import queue
+import tkinter as tk
+from tkinter import filedialog, messagebox
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import ImageTk
+
+from image_cache import ImageCache, ImagePrefetcher, decode_for_display
+from prerender import PrerenderCache, default_cache_dir
+from label_store import LabelStore, LabelFiles
+from annotation_core import AnnotationSession
+from bbox_select import boxes_in_view
+from viewport import Viewport, ImagePyramid, render_region, ZOOM_STEP
+from remote_store import LeaseError
+from image_index import find_image
+from perf import logger
+from question_library import QuestionLibrary
+
+# 拖动超过这个距离（像素）才算框选，否则按单击处理
+DRAG_THRESHOLD = 5
+# 放大时使用的原图金字塔的缓存上限（字节），4K 图像约 33MB 一张
+PYRAMID_CACHE_BYTES = 256 * 1024 * 1024
+# 每次向标注服务领取多少张图像
+CLAIM_BATCH = 10
+# 输入问题后等待多久更新补全列表（毫秒），连续输入时只查找一次
+SUGGEST_DELAY_MS = 120
+SUGGESTION_COUNT = 8
+
+
+class AnnotationWindow(tk.Toplevel):
+    def __init__(self, parent, image_folder, rope3d_path, index_future, annotation_store):
+        super().__init__(parent)
+        self.title("标注窗口")
+        self.geometry("1920x1080")
+        self.parent = parent
+        self.image_folder = image_folder  # 存储传递的 image_folder
+        self.rope3d_path = rope3d_path  # 存储传递的 rope3d_folder
+        # 文件名 -> 序号 的索引在后台读取，准备好之前按文件名直接查找图像，不能切换上一张/下一张
+        self.index_future = index_future
+        self.image_index = None
+        self.image_files = []
+        self.annotation_store = annotation_store  # 问题、答案和选中框的存储
+        self.perf = parent.perf
+        self.show_perf_overlay = False
+        logger.info("初始化 AnnotationWindow: %s", image_folder)
+
+        self.current_index = 0  # 当前图像的索引
+        
+        self.image = None
+        self.image_path = None
+        self.drag_start = None
+        self.box_items = {}  # 框索引 -> (矩形, 文字) 画布元素 ID，只包含视图内的框
+        self.dirty_boxes = set()  # 等待在空闲时更新颜色的框索引
+        self.restyle_pending = False
+
+        # 缩放和平移：viewport 记录显示的原图区域，放大时从金字塔中裁剪可见区域
+        self.viewport = None
+        self.pan_start = None
+        self.render_pending = False
+        self.pyramid = None
+        self.pyramid_future = None
+        self.pyramid_cache = ImageCache(max_bytes=PYRAMID_CACHE_BYTES)
+        self.pyramid_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pyramid")
+
+        # 多人标注：当前租用的图像和已领取、还没打开的图像
+        self.leased_name = None
+        self.claimed = deque()
+
+        # 后台保存的结果 (图像名, 失败时为 (问题, 答案))；保存失败的文本保留到下次打开这张图像时恢复
+        self.save_results = queue.Queue()
+        self.rejected_saves = {}
+
+        # 问题自动补全：已有问题在后台线程中建立索引，建好之前保存的问题先记在 pending_questions 中
+        self.question_library = None
+        self.pending_questions = []
+        self.suggest_job = None
+        self.library_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="questions")
+        self.library_future = self.library_executor.submit(self.build_question_library)
+
+        # 解码缓存和后台预取，有 prerender.py 生成的缓存时直接读取缩放好的图像
+        self.prerender_cache = PrerenderCache.open(default_cache_dir(image_folder))
+        self.prerender_size_checked = False
+        self.image_cache = ImageCache()
+        self.prefetcher = ImagePrefetcher(self.image_cache, decoder=self.decode_image)
+
+        # 数据集标签在后台一次性扫描，扫描完成之前只读取当前图像的标签文件；框、选中状态和保存逻辑都在 session 中
+        self.label_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="labels")
+        self.label_future = self.label_executor.submit(LabelStore, self.rope3d_path)
+        self.session = AnnotationSession(LabelFiles(self.rope3d_path), annotation_store)
+
+        self.setup_ui()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.after(200, self.check_question_library)
+        self.check_image_index()
+        self.after(100, self.check_label_store)
+        self.poll_save_results()
+
+    @property
+    def file_name(self):
+        return self.session.file_name
+
+    def setup_ui(self):
+        top_frame = tk.Frame(self)
+        top_frame.pack(fill="x", pady=10)
+
+        self.file_name_label = tk.Label(top_frame, text="输入文件名(不带后缀):")
+        self.file_name_label.pack(side="left", padx=(10, 2))
+
+        self.file_name_entry = tk.Entry(top_frame, width=70)
+        self.file_name_entry.pack(side="left", padx=(0, 10), fill="x", expand=True)
+
+        self.load_button = tk.Button(top_frame, text="加载图像", command=self.load_image)
+        self.load_button.pack(side="right", padx=(0, 10))
+        self.browse_button = tk.Button(top_frame, text="浏览", command=self.browse_image)
+        self.browse_button.pack(side="right", padx=(0, 10))
+
+        # 如果主界面有保存的文件名，则加载它
+        if self.parent:
+            last_file_name = self.parent.settings.get('last_file_name', '')
+            if last_file_name:  # 确保文件名不是 None 或空字符串
+                self.file_name_entry.insert(0, last_file_name)
+            
+        # 输入问题的容器
+        question_frame = tk.Frame(self)
+        question_frame.pack(fill="x", pady=(5, 0))
+        self.question_label = tk.Label(question_frame, text="输入问题:")
+        self.question_label.pack(side="left", padx=(10, 2))
+        self.question_entry = tk.Text(question_frame, height=2, width=87)
+        self.question_entry.pack(side="left", fill="x", expand=True)
+        self.question_entry.bind("<KeyRelease>", self.schedule_suggestions)
+        self.question_entry.bind("<Down>", self.focus_suggestions)
+        self.question_entry.bind("<Tab>", self.accept_first_suggestion)
+        self.question_entry.bind("<Escape>", self.hide_suggestions)
+        self.question_entry.bind("<FocusOut>", self.on_question_focus_out)
+
+        # 补全列表显示在问题输入框下方，盖住下面的控件
+        self.suggestion_list = tk.Listbox(self, height=SUGGESTION_COUNT, activestyle="dotbox")
+        self.suggestion_list.bind("<Return>", self.accept_suggestion)
+        self.suggestion_list.bind("<Tab>", self.accept_suggestion)
+        self.suggestion_list.bind("<ButtonRelease-1>", self.accept_suggestion)
+        self.suggestion_list.bind("<Escape>", self.hide_suggestions)
+        self.suggestion_list.bind("<Up>", self.suggestion_up)
+
+        # 输入答案的容器
+        answer_frame = tk.Frame(self)
+        answer_frame.pack(fill="x", pady=(5, 0))
+        self.answer_label = tk.Label(answer_frame, text="输入答案:")
+        self.answer_label.pack(side="left", padx=(10, 2))
+        self.answer_entry = tk.Text(answer_frame, height=2, width=87)
+        self.answer_entry.pack(side="left", fill="x", expand=True)
+
+        self.save_button = tk.Button(self, text="保存标注", command=self.save_annotation)
+        self.save_button.pack(pady=(10, 20))
+
+        # 创建一个Frame来放置按钮
+        button_frame = tk.Frame(self)
+        button_frame.pack(side="top", fill="x", padx=10, pady=10)
+
+        self.prev_button = tk.Button(button_frame, text="上一个", command=self.prev_image)
+        self.prev_button.pack(side="left", padx=10)
+
+        self.next_button = tk.Button(button_frame, text="下一个", command=self.next_image)
+        self.next_button.pack(side="right", padx=10)
+
+        if hasattr(self.annotation_store, "claim"):
+            self.claim_button = tk.Button(button_frame, text="领取下一个未标注", command=self.next_claimed)
+            self.claim_button.pack(side="right", padx=10)
+
+        self.image_canvas = tk.Canvas(self, width=1920, height=1080)
+        self.image_canvas.pack(pady=(0, 20))
+        self.image_canvas.bind("<ButtonPress-1>", self.start_drag)
+        self.image_canvas.bind("<B1-Motion>", self.update_drag)
+        self.image_canvas.bind("<ButtonRelease-1>", self.select_bbox)
+        # 滚轮缩放，右键（或中键）拖动平移，双击右键恢复显示整张图像
+        self.image_canvas.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.image_canvas.bind("<Button-4>", self.on_mouse_wheel)
+        self.image_canvas.bind("<Button-5>", self.on_mouse_wheel)
+        for button in (2, 3):
+            self.image_canvas.bind(f"<ButtonPress-{button}>", self.start_pan)
+            self.image_canvas.bind(f"<B{button}-Motion>", self.update_pan)
+        self.image_canvas.bind("<Double-Button-3>", self.reset_view)
+        self.bind("<F2>", self.toggle_perf_overlay)
+
+        # 状态标签
+        self.status_label = tk.Label(self, text="", fg="green", font=("Helvetica", "15", "bold"))
+        self.status_label.pack(side="bottom", fill="x")
+
+        # 缓存命中情况
+        self.cache_label = tk.Label(self, text="", anchor="w")
+        self.cache_label.pack(side="bottom", fill="x")
+
+    def browse_image(self):
+        file_path = filedialog.askopenfilename(initialdir=self.image_folder,
+                                            title="选择图像",
+                                            filetypes=(("JPEG files", "*.jpg;*.jpeg"), ("PNG files", "*.png"), ("All files", "*.*")))
+        if file_path:
+            self.file_name_entry.delete(0, tk.END)
+            self.file_name_entry.insert(0, os.path.splitext(os.path.basename(file_path))[0])
+            self.focus_force()  # 重新获取焦点
+            self.load_image()  # 如果你想加载图像，可以直接调用 load_image 方法
+
+
+    #显示图片和标注的主要处理方法
+    def load_image(self):
+        with self.perf.span("load_image"):
+            self._load_image()
+        self.update_perf_overlay()
+
+    def _load_image(self):
+        self.session.begin(self.file_name_entry.get().strip())  # 直接从输入框获取文件名
+        if not self.file_name:
+            messagebox.showerror("错误", "文件名不能为空")
+            return
+
+        # 查找图像的完整路径并更新当前索引（支持所有图像后缀）
+        image_path = self.find_image_path(self.file_name)
+        if image_path is None:
+            messagebox.showerror("错误", f"图像文件不存在或不在文件列表中: {self.file_name}")
+            return
+        if self.image_index is not None:
+            self.current_index = self.image_index.index_of(self.file_name)
+        self.image_path = image_path
+        self.acquire_lease()
+
+        # 清除画布上的所有内容
+        self.image_canvas.delete("all")
+        self.viewport = None
+
+        # 清除问题和答案输入框的内容
+        self.hide_suggestions()
+        self.question_entry.delete("1.0", tk.END)
+        self.answer_entry.delete("1.0", tk.END)
+
+        # 加载图像（优先使用预取缓存）
+        canvas_width, canvas_height = self.canvas_size()
+        if (self.prerender_cache is not None and not self.prerender_size_checked
+                and (canvas_width > self.prerender_cache.width or canvas_height > self.prerender_cache.height)):
+            # 缓存比画布小的图像会改为解码原图
+            logger.warning("预渲染缓存尺寸为 %dx%d，小于画布 %dx%d，可以用 --width %d --height %d 重新生成",
+                           self.prerender_cache.width, self.prerender_cache.height, canvas_width, canvas_height,
+                           canvas_width, canvas_height)
+        self.prerender_size_checked = True
+        with self.perf.span("fetch"):
+            self.image = self.prefetcher.fetch(image_path, canvas_width, canvas_height)
+        if self.image is not None:
+            self.display_image()
+            self.load_existing_annotations()  # 加载已有标注
+        else:
+            messagebox.showerror("错误", "无法加载图像")
+
+        # 后台预取前后的图像
+        self.prefetcher.prefetch_around(self.image_files, self.current_index, canvas_width, canvas_height)
+        self.update_cache_status()
+
+        # 更新设置
+        self.save_current_settings()
+
+    def find_image_path(self, stem):
+        if self.image_index is not None:
+            return self.image_index.path_of(stem)
+        return find_image(self.image_folder, stem)
+
+    def check_image_index(self):
+        """等待后台读取的图像索引，准备好后开始预取前后的图像"""
+        if not self.winfo_exists():
+            return
+        if not self.index_future.done():
+            self.cache_label.config(text="正在扫描图像文件夹…")
+            self.after(100, self.check_image_index)
+            return
+        try:
+            image_index = self.index_future.result()
+        except OSError as e:
+            messagebox.showerror("错误", f"无法读取图像文件夹: {e}")
+            return
+        self.image_index = image_index
+        self.image_files = image_index.files
+        logger.info("图像索引: %d 张图片", len(self.image_files))
+        if not self.image_files:
+            messagebox.showerror("错误", "没有找到图像文件")
+            return
+        index = image_index.index_of(self.file_name) if self.image_path is not None else None
+        if index is not None:
+            self.current_index = index
+            canvas_width, canvas_height = self.canvas_size()
+            self.prefetcher.prefetch_around(self.image_files, self.current_index, canvas_width, canvas_height)
+        self.update_cache_status()
+
+    def check_label_store(self):
+        if not self.winfo_exists():
+            return
+        if not self.label_future.done():
+            self.after(100, self.check_label_store)
+            return
+        try:
+            self.session.label_store = self.label_future.result()
+        except OSError as e:
+            # 继续逐个读取标签文件
+            logger.warning("无法扫描标签文件夹 %s: %s", self.rope3d_path, e)
+
+    def acquire_lease(self):
+        """使用标注服务时租用当前图像，并释放上一张"""
+        store = self.annotation_store
+        if not hasattr(store, "acquire"):
+            return
+        # 释放放在后台写入队列中，排在上一张图像的保存之后
+        if self.leased_name is not None and self.leased_name != self.file_name:
+            self.release_lease(self.leased_name)
+        self.leased_name = None
+        try:
+            store.acquire(self.file_name)
+            self.leased_name = self.file_name
+        except LeaseError as e:
+            self.show_status_message(f"{e}，修改将无法保存")
+        except OSError as e:
+            messagebox.showerror("错误", f"无法连接标注服务: {e}")
+
+    def release_lease(self, name):
+        """在后台写入队列中释放租约，排在这张图像的保存之后"""
+        self.parent.writer.submit(self.annotation_store.release, name, description=f"释放 {name}")
+
+    def next_claimed(self):
+        """从标注服务领取下一张没有标注、也没有被别人租用的图像"""
+        self.autosave()
+        while True:
+            if not self.claimed:
+                try:
+                    names = self.annotation_store.claim(CLAIM_BATCH)
+                except OSError as e:
+                    messagebox.showerror("错误", f"领取图像失败: {e}")
+                    return
+                if not names:
+                    self.show_status_message("没有可以领取的图像")
+                    return
+                self.claimed.extend(names)
+            name = self.claimed.popleft()
+            if self.find_image_path(name) is not None:
+                break
+            # 本地没有这张图像，立即释放，让其他人可以领取
+            self.release_lease(name)
+        self.file_name_entry.delete(0, tk.END)
+        self.file_name_entry.insert(0, name)
+        self.load_image()
+
+    def load_existing_annotations(self):
+        with self.perf.span("load_existing_annotations"):
+            self._load_existing_annotations()
+        self.restore_rejected_save()
+        self.redraw_bboxes()  # Redraw bounding boxes based on loaded data
+
+    def _load_existing_annotations(self):
+        logger.debug("Attempting to load existing annotations...")
+        # 这张图像的保存还在排队时先等它写完
+        if self.parent.writer.is_pending(f"annotation:{self.file_name}"):
+            self.parent.writer.flush()
+        self.process_save_results()
+        try:
+            annotation = self.session.load_annotation()
+        except (OSError, UnicodeDecodeError) as e:
+            # 读取失败时不知道已保存的内容，按未保存处理，切换图像时仍然会自动保存修改
+            logger.error("无法读取 %s 的标注: %s", self.file_name, e)
+            messagebox.showerror("错误", f"无法读取 {self.file_name} 的标注: {e}")
+            self.session.mark_unsaved()
+            return
+        if annotation is None:
+            self.session.mark_saved(*self.entry_texts())
+            return
+
+        # 加载问题
+        if annotation.question is not None:
+            self.question_entry.insert("1.0", annotation.question)
+
+        # 加载答案
+        if annotation.answer is not None:
+            self.answer_entry.insert("1.0", annotation.answer)
+
+        if annotation.labels is not None:
+            logger.debug("Loaded existing annotations: %d 个框已选中，%d 个框不在数据集标签中",
+                         self.session.selected_mask.sum(), len(self.session.extra_selected))
+        self.session.mark_saved(*self.entry_texts())
+
+    def entry_texts(self):
+        return self.question_entry.get("1.0", tk.END).strip(), self.answer_entry.get("1.0", tk.END).strip()
+
+    def is_dirty(self):
+        """问题、答案或选中的框是否在加载/保存之后被修改过"""
+        return self.session.is_dirty(*self.entry_texts())
+
+    def save_current_settings(self):
+        # 更新设置，由后台线程合并写入文件
+        self.parent.settings.update({
+            'rope3d_path': self.parent.rope3d_path_entry.get(),
+            'image_folder': self.parent.image_folder_entry.get(),
+            'last_file_name': self.file_name,
+            'storage_backend': self.parent.storage_backend_var.get(),
+            'server_url': self.parent.server_url_entry.get().strip(),
+            # prerender.py 默认按这个尺寸生成缓存
+            'canvas_width': self.image_canvas.winfo_width(),
+            'canvas_height': self.image_canvas.winfo_height()
+        })
+        self.parent.queue_settings_save()
+
+    def decode_image(self, image_path, canvas_width, canvas_height):
+        """优先读取预渲染缓存，没有时再解码原图（在预取线程中调用）"""
+        if self.prerender_cache is not None:
+            with self.perf.span("decode_prerendered"):
+                entry = self.prerender_cache.lookup(image_path, canvas_width, canvas_height)
+            if entry is not None:
+                return entry
+        with self.perf.span("decode"):
+            return decode_for_display(image_path, canvas_width, canvas_height)
+
+    def canvas_size(self):
+        # 确保画布尺寸已更新
+        self.update_idletasks()
+        return self.image_canvas.winfo_width(), self.image_canvas.winfo_height()
+
+    def display_image(self):
+        canvas_width, canvas_height = self.canvas_size()
+
+        # 图像已在 image_cache 中完成色彩转换和保持宽高比的缩放，由缩放比例换算原图尺寸
+        image_width = round(self.image.image.width / self.image.scale_x)
+        image_height = round(self.image.image.height / self.image.scale_y)
+        self.viewport = Viewport(image_width, image_height, canvas_width, canvas_height)
+        self.pyramid = None
+        self.pyramid_future = None
+
+        # 加载边界框
+        with self.perf.span("load_bboxes"):
+            self.load_bboxes()
+        self.render_view()
+
+    def render_view(self):
+        """显示视图内的图像区域，并重新绘制视图内的框"""
+        self.render_pending = False
+        viewport = self.viewport
+        with self.perf.span("render_view"):
+            if viewport.is_fit():
+                # 整张图像时直接使用缩放好的图像，居中显示
+                image = self.image.image
+                x = round(-viewport.offset_x * viewport.zoom)
+                y = round(-viewport.offset_y * viewport.zoom)
+            else:
+                self.request_pyramid()
+                if self.pyramid is not None:
+                    image, x, y = self.pyramid.render(viewport)
+                else:
+                    # 金字塔还没生成好时先放大显示用的图像，生成后再重新显示
+                    image, x, y = render_region([self.image.image], viewport)
+            with self.perf.span("photo_image"):
+                self.photo_image = ImageTk.PhotoImage(image)
+            self.image_canvas.delete("view")
+            self.image_canvas.create_image(x, y, image=self.photo_image, anchor=tk.NW, tags="view")
+            self.image_canvas.tag_lower("view")
+
+        self.session.set_view(viewport.zoom, viewport.offset_x, viewport.offset_y)
+        with self.perf.span("draw_bboxes"):
+            self.draw_bboxes()
+
+    def schedule_render(self):
+        """连续的滚轮和拖动事件合并到一次空闲回调中显示"""
+        if not self.render_pending:
+            self.render_pending = True
+            self.after_idle(self.render_view)
+
+    def request_pyramid(self):
+        """第一次放大时在后台解码原图并生成金字塔"""
+        if self.pyramid is not None or self.pyramid_future is not None:
+            return
+        image_path = self.image_path
+        pyramid = self.pyramid_cache.get(image_path)
+        if pyramid is not None:
+            self.pyramid = pyramid
+            return
+        self.pyramid_future = self.pyramid_executor.submit(ImagePyramid.load, image_path, self.image.image.size)
+        self.after(30, self.check_pyramid, self.pyramid_future, image_path)
+
+    def check_pyramid(self, future, image_path):
+        if future is not self.pyramid_future:
+            return  # 已经切换到其他图像
+        if not future.done():
+            self.after(30, self.check_pyramid, future, image_path)
+            return
+        try:
+            pyramid = future.result()
+        except Exception as e:
+            logger.warning("无法生成图像金字塔 %s: %s", image_path, e)
+            return
+        if pyramid is None:
+            return
+        self.pyramid_cache.put(image_path, pyramid)
+        self.pyramid = pyramid
+        if not self.viewport.is_fit():
+            self.schedule_render()
+
+    def on_mouse_wheel(self, event):
+        if self.viewport is None:
+            return
+        # Windows/macOS 使用 delta，Linux 使用 Button-4/5
+        zoom_in = event.num == 4 or (event.num != 5 and event.delta > 0)
+        if self.viewport.zoom_at(ZOOM_STEP if zoom_in else 1 / ZOOM_STEP, event.x, event.y):
+            self.schedule_render()
+
+    def start_pan(self, event):
+        self.pan_start = (event.x, event.y)
+
+    def update_pan(self, event):
+        if self.viewport is None or self.pan_start is None:
+            return
+        x0, y0 = self.pan_start
+        self.pan_start = (event.x, event.y)
+        if self.viewport.pan(event.x - x0, event.y - y0):
+            self.schedule_render()
+
+    def reset_view(self, event=None):
+        if self.viewport is not None and not self.viewport.is_fit():
+            self.viewport.fit()
+            self.schedule_render()
+     
+    def load_bboxes(self):
+        label_file = os.path.join(self.parent.rope3d_path, f"{self.file_name}.txt")
+        logger.debug("Attempting to load bboxes from: %s", label_file)
+        if self.session.load_labels():
+            logger.debug("已添加%d个框到bboxes列表", len(self.session.bboxes))
+        else:
+            logger.warning("Label file does not exist: %s", label_file)
+            messagebox.showerror("错误", "Labels文件夹中没有对应label，请检查路径设置")
+
+    def draw_bboxes(self):
+        session = self.session
+        self.image_canvas.delete("bbox")
+        self.box_items = {}
+        self.dirty_boxes.clear()
+        if not len(session.bboxes):
+            return
+
+        # 只绘制与视图有重叠的框；记录每个框对应的画布元素，之后切换选中状态只需修改颜色
+        visible = boxes_in_view(session.box_coords, self.viewport.canvas_width, self.viewport.canvas_height)
+        logger.debug("Attempting to draw %d of %d bounding boxes...", len(visible), len(session.bboxes))
+        for index, bbox_type, (x1, y1, x2, y2), selected in zip(visible.tolist(), session.bboxes["type"][visible],
+                                                                session.box_coords[visible].tolist(),
+                                                                session.selected_mask[visible].tolist()):
+            color = "yellow" if selected else "blue"
+            bbox_text = f"{bbox_type}"
+            text_x = x1 + 10
+            text_y = y1 + 10
+
+            rect_id = self.image_canvas.create_rectangle(x1, y1, x2, y2, outline=color, width=2, tags="bbox")
+            text_id = self.image_canvas.create_text(text_x, text_y, text=bbox_text, fill=color, font=("Helvetica", "10", "bold"), tags="bbox")
+            self.box_items[index] = (rect_id, text_id)
+
+    def start_drag(self, event):
+        self.drag_start = (event.x, event.y)
+
+    def update_drag(self, event):
+        """拖动时显示框选矩形"""
+        if self.drag_start is None:
+            return
+        x0, y0 = self.drag_start
+        if abs(event.x - x0) < DRAG_THRESHOLD and abs(event.y - y0) < DRAG_THRESHOLD:
+            return
+        self.image_canvas.delete("rubber_band")
+        self.image_canvas.create_rectangle(x0, y0, event.x, event.y, outline="red", dash=(4, 2), tags="rubber_band")
+
+    def select_bbox(self, event):
+        x, y = event.x, event.y
+        x0, y0 = self.drag_start if self.drag_start is not None else (x, y)
+        self.drag_start = None
+        self.image_canvas.delete("rubber_band")
+
+        if abs(x - x0) >= DRAG_THRESHOLD or abs(y - y0) >= DRAG_THRESHOLD:
+            # 框选：选中完全落在矩形内的所有框
+            indices = self.session.select_in_rect(x0, y0, x, y)
+            if len(indices):
+                self.redraw_bboxes(indices.tolist())
+        else:
+            # 单击：切换包含该点的最小的框
+            index = self.session.toggle_at(x, y)
+            if index is not None:
+                self.redraw_bboxes([index])
+
+    def redraw_bboxes(self, indices=None):
+        """根据选中状态更新框的颜色，indices 为空时更新全部框
+
+        多次调用会合并到一次空闲回调中处理，不再强制同步刷新画布。
+        """
+        if indices is None:
+            indices = range(len(self.session.bboxes))
+        self.dirty_boxes.update(indices)
+        if not self.restyle_pending:
+            self.restyle_pending = True
+            self.after_idle(self.apply_box_styles)
+
+    def apply_box_styles(self):
+        self.restyle_pending = False
+        with self.perf.span("redraw_bboxes"):
+            self._apply_box_styles()
+
+    def _apply_box_styles(self):
+        for index in self.dirty_boxes:
+            items = self.box_items.get(index)
+            if items is None:
+                continue  # 不在视图内
+            color = "yellow" if self.session.selected_mask[index] else "blue"
+            rect_id, text_id = items
+            self.image_canvas.itemconfig(rect_id, outline=color)
+            self.image_canvas.itemconfig(text_id, fill=color)
+        self.dirty_boxes.clear()
+
+    def save_annotation(self):
+        if not self.file_name:
+            messagebox.showerror("错误", "文件名不能为空。")
+            return
+        selected = self.session.selected_rows()
+        if not len(selected):
+            # 弹出确认对话框
+            response = messagebox.askyesno("确认", "没有选中任何边界框，是否继续保存空标注？")
+            if not response:
+                return  # 用户选择不保存，直接返回
+
+        question = self.question_entry.get("1.0", tk.END).strip()
+        answer = self.answer_entry.get("1.0", tk.END).strip()
+
+        if not question:
+            messagebox.showerror("错误", "问题不能为空。")
+            return
+        if not answer:
+            messagebox.showerror("错误", "答案不能为空。")
+            return
+
+        with self.perf.span("save_annotation"):
+            self.write_annotation(question, answer, selected)
+        self.show_status_message("标注已成功保存！")
+        self.update_perf_overlay()
+
+    def write_annotation(self, question, answer, selected):
+        # 问题、答案和选中的框一起在后台写入存储；内容没有变化的文件不会重写
+        old_question = self.session.saved_state[0] if self.session.saved_state else None
+        self.update_question_library(old_question, question)
+        self.parent.writer.submit(self.store_annotation, self.file_name, question, answer, selected,
+                                  key=f"annotation:{self.file_name}", description=f"标注 {self.file_name}")
+        self.session.mark_saved(question, answer)
+
+    def store_annotation(self, name, question, answer, selected):
+        """在后台写入线程中执行，失败时仍由 writer 提示错误，同时通知界面这张图像没有保存"""
+        try:
+            with self.perf.span("store_save"):
+                self.annotation_store.save(name, question, answer, selected)
+        except Exception:
+            self.save_results.put((name, (question, answer)))
+            raise
+        self.save_results.put((name, None))
+
+    def poll_save_results(self):
+        if not self.winfo_exists():
+            return
+        self.process_save_results()
+        self.after(500, self.poll_save_results)
+
+    def process_save_results(self):
+        """保存失败的图像重新标记为未保存，切换图像时会再次自动保存"""
+        while True:
+            try:
+                name, rejected = self.save_results.get_nowait()
+            except queue.Empty:
+                return
+            if rejected is None:
+                self.rejected_saves.pop(name, None)
+                continue
+            self.rejected_saves[name] = rejected
+            if name == self.file_name:
+                self.session.mark_unsaved()
+
+    def restore_rejected_save(self):
+        """重新打开保存失败的图像时，用没有保存的问题和答案替换读取到的内容"""
+        rejected = self.rejected_saves.pop(self.file_name, None)
+        if rejected is None:
+            return
+        question, answer = rejected
+        self.question_entry.delete("1.0", tk.END)
+        self.question_entry.insert("1.0", question)
+        self.answer_entry.delete("1.0", tk.END)
+        self.answer_entry.insert("1.0", answer)
+        self.session.mark_unsaved()
+        self.show_status_message(f"已恢复 {self.file_name} 上次没有保存成功的问题和答案，请检查后重新保存")
+
+    def autosave(self):
+        """切换图像前自动保存未保存的修改，不弹出对话框"""
+        if not self.file_name or not self.is_dirty():
+            return
+        question, answer = self.entry_texts()
+        if not question or not answer:
+            self.show_status_message(f"{self.file_name} 的问题或答案为空，修改没有自动保存")
+            return
+        self.write_annotation(question, answer, self.session.selected_rows())
+        self.show_status_message(f"已自动保存 {self.file_name}")
+
+    def build_question_library(self):
+        """在后台线程中读取已有问题并建立索引，存储不支持统计问题时返回 None"""
+        try:
+            counts, _ = self.annotation_store.count_questions()
+        except (NotImplementedError, OSError) as e:
+            logger.info("不使用问题自动补全: %s", e or type(e).__name__)
+            return None
+        with self.perf.span("build_question_library"):
+            return QuestionLibrary(counts)
+
+    def check_question_library(self):
+        if not self.winfo_exists():
+            return
+        if not self.library_future.done():
+            self.after(200, self.check_question_library)
+            return
+        try:
+            library = self.library_future.result()
+        except Exception as e:
+            logger.error("建立问题索引失败: %s", e)
+            return
+        if library is None:
+            return
+        for old_question, new_question in self.pending_questions:
+            library.replace(old_question, new_question)
+        self.pending_questions.clear()
+        self.question_library = library
+        logger.info("问题自动补全: %d 个问题", len(library))
+
+    def update_question_library(self, old_question, new_question):
+        if self.question_library is not None:
+            self.question_library.replace(old_question, new_question)
+        else:
+            self.pending_questions.append((old_question, new_question))
+
+    def schedule_suggestions(self, event=None):
+        if event is not None and event.keysym in ("Down", "Up", "Tab", "Escape", "Return"):
+            return
+        if self.suggest_job is not None:
+            self.after_cancel(self.suggest_job)
+        self.suggest_job = self.after(SUGGEST_DELAY_MS, self.update_suggestions)
+
+    def update_suggestions(self):
+        self.suggest_job = None
+        question = self.question_entry.get("1.0", tk.END).strip()
+        if self.question_library is None or not question:
+            self.hide_suggestions()
+            return
+        with self.perf.span("suggest_questions"):
+            suggestions = [text for text in self.question_library.suggest(question, SUGGESTION_COUNT)
+                           if text != question]
+        if not suggestions:
+            self.hide_suggestions()
+            return
+        self.suggestion_list.delete(0, tk.END)
+        self.suggestion_list.insert(tk.END, *suggestions)
+        self.suggestion_list.config(height=len(suggestions))
+        self.suggestion_list.place(in_=self.question_entry, relx=0, rely=1, relwidth=1)
+        self.suggestion_list.lift()
+
+    def suggestions_visible(self):
+        return bool(self.suggestion_list.winfo_ismapped())
+
+    def hide_suggestions(self, event=None):
+        if self.suggest_job is not None:
+            self.after_cancel(self.suggest_job)
+            self.suggest_job = None
+        self.suggestion_list.place_forget()
+        if event is not None and event.widget is self.suggestion_list:
+            self.question_entry.focus_set()
+
+    def on_question_focus_out(self, event):
+        # 焦点移到补全列表时保持显示
+        self.after_idle(self._hide_if_unfocused)
+
+    def _hide_if_unfocused(self):
+        if self.focus_get() not in (self.question_entry, self.suggestion_list):
+            self.hide_suggestions()
+
+    def focus_suggestions(self, event):
+        if not self.suggestions_visible():
+            return None
+        self.suggestion_list.focus_set()
+        self.suggestion_list.selection_clear(0, tk.END)
+        self.suggestion_list.selection_set(0)
+        self.suggestion_list.activate(0)
+        return "break"
+
+    def suggestion_up(self, event):
+        # 在第一项上按上键回到输入框
+        if self.suggestion_list.index(tk.ACTIVE) == 0:
+            self.question_entry.focus_set()
+            return "break"
+        return None
+
+    def accept_first_suggestion(self, event):
+        if not self.suggestions_visible():
+            return None
+        self.set_question(self.suggestion_list.get(0))
+        return "break"
+
+    def accept_suggestion(self, event):
+        selection = self.suggestion_list.curselection()
+        index = selection[0] if selection else self.suggestion_list.index(tk.ACTIVE)
+        self.set_question(self.suggestion_list.get(index))
+        return "break"
+
+    def set_question(self, question):
+        self.hide_suggestions()
+        self.question_entry.delete("1.0", tk.END)
+        self.question_entry.insert("1.0", question)
+        self.question_entry.focus_set()
+        self.question_entry.mark_set(tk.INSERT, tk.END)
+
+    def show_status_message(self, text):
+        self.status_label.config(text=text)
+        self.status_label.place(relx=0.5, rely=0.5, anchor="center")
+        self.after(3000, self.clear_status_message)  # 3秒后清除状态消息
+
+    def clear_status_message(self):
+        """清除状态消息"""
+        self.status_label.config(text="")
+        self.status_label.place_forget()  # 可以使用 place_forget 来隐藏标签
+
+    def update_cache_status(self):
+        """在状态栏显示缓存命中情况"""
+        self.cache_label.config(text=self.image_cache.stats_text())
+
+    def toggle_perf_overlay(self, event=None):
+        self.show_perf_overlay = not self.show_perf_overlay
+        self.update_perf_overlay()
+
+    def update_perf_overlay(self):
+        """在画布左上角显示各计时段的 p50/p95"""
+        self.image_canvas.delete("perf_overlay")
+        if not self.show_perf_overlay:
+            return
+        text_id = self.image_canvas.create_text(10, 10, text=self.perf.stats_text(), anchor="nw", fill="white",
+                                                font=("Courier", "10"), tags="perf_overlay")
+        x1, y1, x2, y2 = self.image_canvas.bbox(text_id)
+        background_id = self.image_canvas.create_rectangle(x1 - 4, y1 - 4, x2 + 4, y2 + 4, fill="black",
+                                                           outline="", tags="perf_overlay")
+        self.image_canvas.tag_lower(background_id, text_id)
+
+    def on_close(self):
+        """关闭窗口时自动保存修改，停止后台预取，并等待未完成的保存"""
+        self.autosave()
+        if self.leased_name is not None:
+            self.release_lease(self.leased_name)
+        # 领取了但还没有打开的图像也要释放，否则要等租约过期才能被别人领取
+        while self.claimed:
+            self.release_lease(self.claimed.popleft())
+        self.prefetcher.shutdown()
+        self.pyramid_executor.shutdown(wait=False)
+        self.library_executor.shutdown(wait=False)
+        self.label_executor.shutdown(wait=False)
+        self.parent.writer.flush()
+        self.destroy()
+
+
+
+
+    def prev_image(self):
+        if self.image_index is None:
+            self.show_status_message("正在扫描图像文件夹，请稍后再切换")
+        elif len(self.image_files) > 0:
+            self.autosave()
+            self.current_index = (self.current_index - 1) % len(self.image_files)
+            self.update_image_entry()
+            self.load_image()
+        else:
+            logger.error("没有图片可切换到上一张。")
+
+    def next_image(self):
+        if self.image_index is None:
+            self.show_status_message("正在扫描图像文件夹，请稍后再切换")
+        elif len(self.image_files) > 0:
+            self.autosave()
+            self.current_index = (self.current_index + 1) % len(self.image_files)
+            self.update_image_entry()
+            self.load_image()
+        else:
+            logger.error("没有图片可切换到下一张。")
+
+    def update_image_entry(self):
+        """更新输入框以反映当前索引的图像文件名"""
+        current_file = os.path.basename(self.image_files[self.current_index])
+        current_file_name = os.path.splitext(current_file)[0]  # 去掉扩展名
+        self.file_name_entry.delete(0, tk.END)
+        self.file_name_entry.insert(0, current_file_name)
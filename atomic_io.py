@@ -0,0 +1,25 @@
+import os
+import tempfile
+
+# mkstemp 创建的文件权限为 0600，替换后按正常新建文件的权限设置
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def atomic_write_text(path, text, encoding='utf-8', newline=None):
+    """先写入同目录下的临时文件，再用 os.replace 替换，保证文件不会只写了一半"""
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding, newline=newline) as file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temp_path, 0o666 & ~_UMASK)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
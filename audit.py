@@ -0,0 +1,184 @@
+"""检查整个数据集的标注是否完整、一致
+
+逐条输出 JSON Lines，最后一行为汇总统计:
+    incomplete      Questions/Answers/Labels 不是完整的三个文件
+    empty_text      问题或答案为空
+    encoding_error  文件不是合法的 UTF-8
+    malformed_row   标签行不是 15 个字段或字段无法解析（source 为 true 时是 Rope3D 原始标签）
+    missing_source  Rope3D 中没有对应的标签文件
+    orphan_row      Labels 中的行在 Rope3D 原始标签中找不到
+    missing_image   图像文件夹中没有对应的图像（需要 --image-folder）
+
+    python audit.py D:\\VQA\\validation\\label_2 --image-folder D:\\VQA\\validation\\image_2 -o audit.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from annotation_store import FOLDER_NAMES
+from image_index import IMAGE_EXTENSIONS
+from label_store import LABEL_FIELD_COUNT, parse_label_parts
+
+CHUNK_SIZE = 256
+
+
+def _row_key(parsed):
+    type_, truncated, occluded, angle, bbox2d, dimensions, position, rotation_y = parsed
+    return (type_, truncated, occluded, angle, *bbox2d, *dimensions, *position, rotation_y)
+
+
+def _read_text(path, records):
+    """读取 UTF-8 文本，文件不存在返回 None，解码失败时记录错误并返回 None"""
+    try:
+        with open(path, 'rb') as file:
+            raw = file.read()
+    except FileNotFoundError:
+        return None
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError as e:
+        records.append({"kind": "encoding_error", "file": path, "error": str(e)})
+        return None
+
+
+def _check_rows(text, path, records, source):
+    """检查每一行的字段，返回 [(行号, 解析结果)]"""
+    rows = []
+    for line_number, line in enumerate(text.splitlines(), 1):
+        parts = line.split()
+        if not parts:
+            continue
+        if len(parts) != LABEL_FIELD_COUNT:
+            records.append({"kind": "malformed_row", "file": path, "line": line_number, "source": source,
+                            "error": f"{len(parts)} 个字段，应为 {LABEL_FIELD_COUNT}"})
+            if len(parts) < LABEL_FIELD_COUNT:
+                continue
+        try:
+            rows.append((line_number, parse_label_parts(parts)))
+        except ValueError as e:
+            records.append({"kind": "malformed_row", "file": path, "line": line_number, "source": source,
+                            "error": str(e)})
+    return rows
+
+
+def audit_chunk(names, root, rope3d_path):
+    """检查一批图像，返回 (记录列表, 统计)；在子进程中执行"""
+    records = []
+    stats = {"frames": 0, "annotated": 0, "selected": Counter(), "source": Counter()}
+    for name in names:
+        stats["frames"] += 1
+        present = []
+        texts = {}
+        for folder in FOLDER_NAMES:
+            path = os.path.join(root, folder, f"{name}.txt")
+            if os.path.exists(path):
+                present.append(folder)
+                texts[folder] = _read_text(path, records)
+
+        if present:
+            stats["annotated"] += 1
+            missing = [folder for folder in FOLDER_NAMES if folder not in present]
+            if missing:
+                records.append({"kind": "incomplete", "name": name, "missing": missing})
+            for folder in FOLDER_NAMES[:2]:
+                if texts.get(folder) is not None and not texts[folder].strip():
+                    records.append({"kind": "empty_text", "name": name, "folder": folder})
+
+        source_path = os.path.join(rope3d_path, f"{name}.txt")
+        source_text = _read_text(source_path, records)
+        source_keys = None
+        if source_text is not None:
+            source_rows = _check_rows(source_text, source_path, records, source=True)
+            source_keys = {_row_key(parsed) for _, parsed in source_rows}
+            stats["source"].update(parsed[0] for _, parsed in source_rows)
+
+        label_text = texts.get("Labels")
+        if label_text is None:
+            continue
+        label_path = os.path.join(root, "Labels", f"{name}.txt")
+        label_rows = _check_rows(label_text, label_path, records, source=False)
+        stats["selected"].update(parsed[0] for _, parsed in label_rows)
+        if label_rows and source_keys is None:
+            records.append({"kind": "missing_source", "name": name, "file": source_path})
+            continue
+        for line_number, parsed in label_rows:
+            if _row_key(parsed) not in source_keys:
+                records.append({"kind": "orphan_row", "file": label_path, "line": line_number})
+    return records, stats
+
+
+def _list_stems(directory, extensions=(".txt",)):
+    if not os.path.isdir(directory):
+        return set()
+    with os.scandir(directory) as entries:
+        return {os.path.splitext(entry.name)[0] for entry in entries
+                if entry.name.lower().endswith(extensions) and entry.is_file()}
+
+
+def audit(rope3d_path, root, output, image_folder=None, annotations_only=False, workers=None):
+    """并行检查数据集，把结果逐行写入 output，返回汇总统计"""
+    start = time.perf_counter()
+    annotated = set()
+    for folder in FOLDER_NAMES:
+        annotated |= _list_stems(os.path.join(root, folder))
+    names = annotated if annotations_only else annotated | _list_stems(rope3d_path)
+
+    names = sorted(names)
+    chunks = [names[i:i + CHUNK_SIZE] for i in range(0, len(names), CHUNK_SIZE)]
+    kinds = Counter()
+    summary = {"frames": 0, "annotated": 0, "selected": Counter(), "source": Counter()}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(audit_chunk, chunks, [root] * len(chunks), [rope3d_path] * len(chunks))
+        for records, stats in results:
+            for record in records:
+                kinds[record["kind"]] += 1
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            for key, value in stats.items():
+                summary[key] += value
+
+    # 图像是否存在只需要比较文件名集合，在主进程中完成，不把整个集合发给每个子进程
+    if image_folder:
+        image_stems = _list_stems(image_folder, IMAGE_EXTENSIONS)
+        for name in sorted(annotated - image_stems):
+            kinds["missing_image"] += 1
+            output.write(json.dumps({"kind": "missing_image", "name": name}, ensure_ascii=False) + "\n")
+
+    summary = {
+        "kind": "summary",
+        "frames": summary["frames"],
+        "annotated": summary["annotated"],
+        "issues": dict(kinds),
+        "selected_per_class": dict(summary["selected"].most_common()),
+        "source_per_class": dict(summary["source"].most_common()),
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+    output.write(json.dumps(summary, ensure_ascii=False) + "\n")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="检查标注数据集的完整性和一致性")
+    parser.add_argument("rope3d_path", help="Rope3D 标签文件夹 (label_2)")
+    parser.add_argument("--root", help="Questions/Answers/Labels 所在的目录，默认为 rope3d_path 的父目录")
+    parser.add_argument("--image-folder", help="图像文件夹，指定时检查图像是否存在")
+    parser.add_argument("--annotations-only", action="store_true", help="只检查有标注的图像")
+    parser.add_argument("-o", "--output", help="输出的 JSONL 文件，默认为标准输出")
+    parser.add_argument("--workers", type=int, default=None, help="进程数")
+    args = parser.parse_args(argv)
+
+    root = args.root or os.path.dirname(os.path.normpath(args.rope3d_path))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            summary = audit(args.rope3d_path, root, output, args.image_folder, args.annotations_only, args.workers)
+        print(json.dumps(summary, ensure_ascii=False, indent=1))
+    else:
+        audit(args.rope3d_path, root, sys.stdout, args.image_folder, args.annotations_only, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import queue
+import threading
+
+
+class BackgroundWriter:
+    """在后台线程中依次执行写文件任务，避免阻塞 Tk 主线程
+
+    带 key 提交的任务会合并：同一个 key 还没执行时再次提交，只执行最后一次。
+    失败的任务记录在 errors 队列中，由界面在主线程中取出并提示。
+    """
+
+    def __init__(self):
+        self.errors = queue.Queue()  # (描述, 异常)
+        self._queue = queue.Queue()
+        self._latest = {}  # key -> 最新的 (func, args, description)
+        self._running_key = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="background-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args, key=None, description=""):
+        if self._closed:
+            raise RuntimeError("BackgroundWriter 已关闭")
+        job = (func, args, description)
+        if key is None:
+            self._queue.put(("job", job))
+            return
+        with self._lock:
+            queued = key in self._latest
+            self._latest[key] = job
+        if not queued:
+            self._queue.put(("key", key))
+
+    def is_pending(self, key):
+        with self._lock:
+            return key in self._latest or key == self._running_key
+
+    def flush(self):
+        """等待已提交的任务全部完成"""
+        self._queue.join()
+
+    def close(self):
+        """执行完剩余任务后停止后台线程"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def pop_errors(self):
+        errors = []
+        while True:
+            try:
+                errors.append(self.errors.get_nowait())
+            except queue.Empty:
+                return errors
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                kind, value = item
+                if kind == "job":
+                    job = value
+                else:
+                    with self._lock:
+                        job = self._latest.pop(value)
+                        self._running_key = value
+                func, args, description = job
+                try:
+                    func(*args)
+                except Exception as e:
+                    self.errors.put((description, e))
+            finally:
+                with self._lock:
+                    self._running_key = None
+                self._queue.task_done()
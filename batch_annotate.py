@@ -0,0 +1,215 @@
+"""按规则文件从 Rope3D 标签批量生成标注，生成后在标注程序中人工检查和修改
+
+规则文件为 JSON Lines，每行一条规则；每张图像使用第一条满足条件的规则:
+    {"name": "count_pedestrian", "types": ["pedestrian"], "min_count": 1,
+     "question": "How many pedestrians are there?", "answer": "{count}"}
+    {"types": ["car", "van"], "max_occluded": 1, "min_height": 20,
+     "question": "Where are the {types}?", "answer": "There are {count} {types}."}
+
+过滤条件（都可以省略）:
+    types           类别（不区分大小写），省略时为所有类别
+    max_truncated   truncated 不大于这个值
+    max_occluded    occluded 不大于这个值
+    min_height      2D 框的高度（像素）不小于这个值
+    min_count       满足条件的框至少有几个，默认 1
+    max_count       满足条件的框最多有几个
+question/answer 中可以使用 {count}、{type}（第一个类别）、{types}（所有类别）和 {name}（图像名）。
+满足条件的框保存为选中的框，与在标注程序中点选的结果相同。
+
+    python batch_annotate.py D:\\VQA\\validation\\label_2 rules.jsonl --dry-run
+    python batch_annotate.py D:\\VQA\\validation\\label_2 rules.jsonl --backend sqlite --workers 8
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from annotation_store import STORAGE_BACKENDS, open_store
+from image_index import list_frames
+from label_store import read_label_file
+
+CHUNK_SIZE = 256
+# 检查模板时使用的示例值
+TEMPLATE_FIELDS = {"count": 0, "type": "", "types": "", "name": ""}
+
+
+class AnnotationRule:
+    """一条生成规则：过滤框，满足数量条件时用模板生成问题和答案"""
+
+    def __init__(self, name, question, answer, types=None, max_truncated=None, max_occluded=None,
+                 min_height=None, min_count=1, max_count=None):
+        self.name = name
+        self.question = question
+        self.answer = answer
+        self.types = [t.lower() for t in types] if types else None
+        self.max_truncated = max_truncated
+        self.max_occluded = max_occluded
+        self.min_height = min_height
+        self.min_count = min_count
+        self.max_count = max_count
+        for template in (question, answer):
+            # 模板中有未知的字段时在读取规则时就报错
+            template.format(**TEMPLATE_FIELDS)
+
+    @classmethod
+    def from_dict(cls, data, default_name):
+        data = dict(data)
+        return cls(data.pop("name", default_name), data.pop("question"), data.pop("answer"), **data)
+
+    def mask(self, rows):
+        """满足过滤条件的框"""
+        mask = np.ones(len(rows), dtype=bool)
+        if self.types is not None:
+            mask &= np.isin(np.char.lower(rows["type"]), self.types)
+        if self.max_truncated is not None:
+            mask &= rows["truncated"] <= self.max_truncated
+        if self.max_occluded is not None:
+            mask &= rows["occluded"] <= self.max_occluded
+        if self.min_height is not None:
+            mask &= rows["bbox2d"][:, 3] - rows["bbox2d"][:, 1] >= self.min_height
+        return mask
+
+    def apply(self, rows, name=""):
+        """返回 (问题, 答案, 选中状态)，不满足数量条件时返回 None"""
+        mask = self.mask(rows)
+        count = int(mask.sum())
+        if count < self.min_count or (self.max_count is not None and count > self.max_count):
+            return None
+        types = self.types or sorted({str(t).lower() for t in rows["type"][mask]}) or ["object"]
+        fields = {"count": count, "type": types[0], "types": ", ".join(types), "name": name}
+        return self.question.format(**fields), self.answer.format(**fields), mask
+
+
+def load_rules(path):
+    """读取规则文件，返回 [AnnotationRule]"""
+    rules = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line_number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rules.append(AnnotationRule.from_dict(json.loads(line), f"rule{line_number}"))
+            except (ValueError, KeyError, TypeError, IndexError) as e:
+                raise ValueError(f"{path}:{line_number}: 无效的规则: {e!r}") from e
+    if not rules:
+        raise ValueError(f"{path}: 没有规则")
+    return rules
+
+
+def match_rules(rules, rows, name=""):
+    """第一条满足条件的规则，返回 (规则, 问题, 答案, 选中状态)，都不满足时返回 None"""
+    for rule in rules:
+        result = rule.apply(rows, name)
+        if result is not None:
+            return (rule,) + result
+    return None
+
+
+def annotate_session(session, rules):
+    """在 AnnotationSession 的当前图像上应用规则并保存，返回使用的规则，没有满足条件的规则时返回 None
+
+    调用前需要 session.begin(name)；不需要 Tk，可以在脚本中逐张使用。
+    """
+    session.load_labels()
+    matched = match_rules(rules, session.bboxes, session.file_name)
+    if matched is None:
+        return None
+    rule, question, answer, mask = matched
+    session.set_selection(mask)
+    session.save(question, answer)
+    return rule
+
+
+def annotate_chunk(names, rope3d_path, rules):
+    """生成一批图像的标注（只读），返回 ([(name, 问题, 答案, 选中的框)], 统计)，在子进程中执行"""
+    items = []
+    stats = Counter()
+    for name in names:
+        try:
+            rows = read_label_file(os.path.join(rope3d_path, f"{name}.txt"))
+        except (OSError, UnicodeDecodeError):
+            stats["unreadable"] += 1
+            continue
+        matched = match_rules(rules, rows, name)
+        if matched is None:
+            stats["no_match"] += 1
+            continue
+        rule, question, answer, mask = matched
+        items.append((name, question, answer, rows[mask]))
+        stats[f"rule:{rule.name}"] += 1
+    return items, stats
+
+
+def batch_annotate(rope3d_path, store, rules, names=None, overwrite=False, dry_run=False, workers=None):
+    """并行生成标注并通过 store 保存，返回汇总统计
+
+    已有标注的图像默认跳过，不会覆盖人工标注；dry_run 时只统计不保存。
+    """
+    start = time.perf_counter()
+    names = list_frames(rope3d_path) if names is None else list(names)
+    skipped = 0
+    if not overwrite:
+        existing = set(store.names())
+        skipped = sum(name in existing for name in names)
+        names = [name for name in names if name not in existing]
+
+    chunks = [names[i:i + CHUNK_SIZE] for i in range(0, len(names), CHUNK_SIZE)]
+    stats = Counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # 子进程只读取标签和生成文本，保存都在主进程中通过 store 完成
+        for items, chunk_stats in executor.map(annotate_chunk, chunks, [rope3d_path] * len(chunks),
+                                               [rules] * len(chunks)):
+            stats.update(chunk_stats)
+            if items and not dry_run:
+                store.save_many(items)
+            stats["annotated"] += len(items)
+
+    return {
+        "frames": len(names) + skipped,
+        "annotated": stats.pop("annotated", 0),
+        "skipped_existing": skipped,
+        "no_match": stats.pop("no_match", 0),
+        "unreadable": stats.pop("unreadable", 0),
+        "per_rule": {key[len("rule:"):]: count for key, count in stats.most_common()},
+        "dry_run": dry_run,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按规则文件从 Rope3D 标签批量生成标注")
+    parser.add_argument("rope3d_path", help="Rope3D 标签文件夹 (label_2)")
+    parser.add_argument("rules", help="规则文件 (JSON Lines)")
+    parser.add_argument("--root", help="Questions/Answers/Labels 所在的目录，默认为 rope3d_path 的父目录")
+    parser.add_argument("--backend", choices=STORAGE_BACKENDS, default="txt", help="标注的存储方式")
+    parser.add_argument("--names", help="只处理这个文件中列出的图像名（每行一个）")
+    parser.add_argument("--overwrite", action="store_true", help="覆盖已有的标注")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不保存")
+    parser.add_argument("--workers", type=int, default=None, help="进程数")
+    args = parser.parse_args(argv)
+
+    try:
+        rules = load_rules(args.rules)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    names = None
+    if args.names:
+        with open(args.names, 'r', encoding='utf-8') as file:
+            names = [line.strip() for line in file if line.strip()]
+
+    root = args.root or os.path.dirname(os.path.normpath(args.rope3d_path))
+    store = open_store(root, args.backend)
+    try:
+        summary = batch_annotate(args.rope3d_path, store, rules, names, args.overwrite, args.dry_run, args.workers)
+    finally:
+        store.close()
+    print(json.dumps(summary, ensure_ascii=False, indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import numpy as np
+
+
+def scale_boxes(bbox2d, scale_x, scale_y):
+    """把 (N,4) 的原图坐标缩放到画布坐标"""
+    return np.asarray(bbox2d, dtype=np.float64).reshape(-1, 4) * np.array([scale_x, scale_y, scale_x, scale_y])
+
+
+def transform_boxes(bbox2d, zoom, offset_x, offset_y):
+    """把 (N,4) 的原图坐标换算到缩放、平移后的画布坐标"""
+    offset = np.array([offset_x, offset_y, offset_x, offset_y])
+    return (np.asarray(bbox2d, dtype=np.float64).reshape(-1, 4) - offset) * zoom
+
+
+def boxes_in_view(boxes, width, height):
+    """返回与画布 (0, 0, width, height) 有重叠的框的索引"""
+    visible = (boxes[:, 2] >= 0) & (boxes[:, 0] <= width) & (boxes[:, 3] >= 0) & (boxes[:, 1] <= height)
+    return np.flatnonzero(visible)
+
+
+def box_areas(boxes):
+    return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+
+def hit_test(boxes, x, y):
+    """返回包含点 (x, y) 的所有框的索引，面积最小的排在最前"""
+    inside = (boxes[:, 0] <= x) & (x <= boxes[:, 2]) & (boxes[:, 1] <= y) & (y <= boxes[:, 3])
+    hits = np.flatnonzero(inside)
+    if len(hits) > 1:
+        hits = hits[np.argsort(box_areas(boxes[hits]), kind="stable")]
+    return hits
+
+
+def boxes_in_rect(boxes, x1, y1, x2, y2):
+    """返回完全落在框选矩形内的框的索引"""
+    left, right = min(x1, x2), max(x1, x2)
+    top, bottom = min(y1, y2), max(y1, y2)
+    inside = (boxes[:, 0] >= left) & (boxes[:, 2] <= right) & (boxes[:, 1] >= top) & (boxes[:, 3] <= bottom)
+    return np.flatnonzero(inside)
+
+
+def match_rows(records, rows):
+    """找出 rows 中每一行在 records 里对应的位置
+
+    返回 (records 上的选中掩码, rows 中没有匹配上的行)。
+    """
+    mask = np.zeros(len(records), dtype=bool)
+    unmatched = np.ones(len(rows), dtype=bool)
+    for i, row in enumerate(rows):
+        same = np.flatnonzero(records == row)
+        same = same[~mask[same]]  # 重复的行依次对应
+        if len(same):
+            mask[same[0]] = True
+            unmatched[i] = False
+    return mask, rows[unmatched]
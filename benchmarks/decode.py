@@ -0,0 +1,86 @@
+"""比较原来的全分辨率解码和降采样解码的耗时与峰值内存
+
+每种解码方式在单独的子进程中运行，峰值内存为解码前后进程 RSS 峰值之差。
+image_cache 用到时才导入 cv2，两种方式都在计时和记录内存基准之前导入，导入的耗时单独列出。
+
+    python -m benchmarks.decode D:\\Rope3D\\image_2 --limit 200
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import time
+
+from image_index import IMAGE_EXTENSIONS
+from perf import percentile
+
+
+def peak_rss_bytes():
+    """当前进程的峰值 RSS（字节），无法获取时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return getattr(psutil.Process().memory_info(), "peak_wset", None)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def run_decoder(mode, paths, canvas_width, canvas_height, queue):
+    import image_cache
+    decoder = image_cache.decode_for_display_full if mode == "full" else image_cache.decode_for_display
+    start = time.perf_counter()
+    import cv2  # noqa: F401
+    import_seconds = time.perf_counter() - start
+
+    baseline = peak_rss_bytes()
+    timings = []
+    for path in paths:
+        start = time.perf_counter()
+        entry = decoder(path, canvas_width, canvas_height)
+        timings.append(time.perf_counter() - start)
+        del entry
+    peak = peak_rss_bytes()
+    queue.put((timings, None if baseline is None or peak is None else peak - baseline, import_seconds))
+
+
+def benchmark(paths, canvas_width, canvas_height):
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for mode in ("full", "reduced"):
+        queue = context.Queue()
+        process = context.Process(target=run_decoder, args=(mode, paths, canvas_width, canvas_height, queue))
+        process.start()
+        results[mode] = queue.get()
+        process.join()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="比较全分辨率解码和降采样解码")
+    parser.add_argument("image_folder")
+    parser.add_argument("--width", type=int, default=1920, help="画布宽度")
+    parser.add_argument("--height", type=int, default=1080, help="画布高度")
+    parser.add_argument("--limit", type=int, default=100, help="最多测试多少张图像")
+    args = parser.parse_args(argv)
+
+    paths = sorted(os.path.join(args.image_folder, name) for name in os.listdir(args.image_folder)
+                   if name.lower().endswith(IMAGE_EXTENSIONS))[:args.limit]
+    if not paths:
+        print("没有找到图像文件")
+        return
+
+    print(f"{len(paths)} 张图像，画布 {args.width}x{args.height}")
+    print(f"{'mode':<8} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'peak MB':>8} {'cv2 ms':>8}")
+    for mode, (timings, peak, import_seconds) in benchmark(paths, args.width, args.height).items():
+        peak_text = "n/a" if peak is None else f"{peak / (1024 * 1024):.1f}"
+        print(f"{mode:<8} {statistics.mean(timings) * 1000:>8.1f} {percentile(timings, 0.5) * 1000:>8.1f} "
+              f"{percentile(timings, 0.95) * 1000:>8.1f} {peak_text:>8} {import_seconds * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
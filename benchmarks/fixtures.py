@@ -0,0 +1,94 @@
+"""生成 Rope3D 格式的合成数据集，用于基准测试
+
+    python -m benchmarks.fixtures D:\\bench --files 2000 --boxes 40
+
+生成的目录结构与真实数据集相同:
+    <root>/image_2/<name>.jpg
+    <root>/label_2/<name>.txt
+    <root>/Questions、Answers、Labels（--annotated 指定比例的图像带有标注）
+"""
+import argparse
+import os
+import random
+
+import numpy as np
+from PIL import Image
+
+from annotation_store import TxtAnnotationStore
+from label_store import parse_label_lines
+
+CLASSES = ("car", "van", "truck", "bus", "pedestrian", "cyclist", "motorcyclist", "tricyclist", "trafficcone")
+QUESTIONS = (
+    "Where are pedestrians crossing the road?",
+    "Which vehicles are waiting at the intersection?",
+    "How many buses are in the left lane?",
+    "Which cars are parked on the roadside?",
+    "Are there any cyclists near the crosswalk?",
+)
+IMAGE_WIDTH = 1920
+IMAGE_HEIGHT = 1080
+
+
+def frame_name(index):
+    # 与 Rope3D 的文件名类似，数字部分不补零，用来覆盖自然排序
+    return f"{1632 + index % 7}_fa2sd4a{index % 13}_420_{index}_0"
+
+
+def label_line(rng, width, height):
+    x1 = rng.uniform(0, width - 40)
+    y1 = rng.uniform(0, height - 40)
+    x2 = min(width, x1 + rng.uniform(20, 400))
+    y2 = min(height, y1 + rng.uniform(20, 300))
+    values = [
+        rng.choice(CLASSES), rng.randint(0, 2), rng.randint(0, 2), round(rng.uniform(-3.14, 3.14), 6),
+        round(x1, 6), round(y1, 6), round(x2, 6), round(y2, 6),
+        round(rng.uniform(1, 4), 6), round(rng.uniform(1, 3), 6), round(rng.uniform(2, 12), 6),
+        round(rng.uniform(-30, 30), 6), round(rng.uniform(-2, 8), 6), round(rng.uniform(5, 120), 6),
+        round(rng.uniform(-3.14, 3.14), 6),
+    ]
+    return " ".join(map(str, values))
+
+
+def generate(root, files=500, boxes=30, annotated=0.5, image_size=(IMAGE_WIDTH, IMAGE_HEIGHT), seed=0):
+    """生成数据集并返回 (图像文件夹, 标签文件夹)；同样的参数总是生成同样的内容"""
+    rng = random.Random(seed)
+    image_folder = os.path.join(root, "image_2")
+    label_folder = os.path.join(root, "label_2")
+    os.makedirs(image_folder, exist_ok=True)
+    os.makedirs(label_folder, exist_ok=True)
+    store = TxtAnnotationStore(root)
+
+    # 所有图像使用同一张噪声图，生成速度只取决于写文件
+    noise = np.random.default_rng(seed).integers(0, 256, (image_size[1] // 8, image_size[0] // 8, 3), dtype=np.uint8)
+    Image.fromarray(noise).resize(image_size).save(os.path.join(image_folder, "template.jpg"), quality=90)
+    with open(os.path.join(image_folder, "template.jpg"), 'rb') as file:
+        image_bytes = file.read()
+    os.remove(os.path.join(image_folder, "template.jpg"))
+
+    for index in range(files):
+        name = frame_name(index)
+        with open(os.path.join(image_folder, f"{name}.jpg"), 'wb') as file:
+            file.write(image_bytes)
+        lines = [label_line(rng, *image_size) for _ in range(rng.randint(max(1, boxes // 2), boxes * 3 // 2))]
+        with open(os.path.join(label_folder, f"{name}.txt"), 'w') as file:
+            file.write("\n".join(lines) + "\n")
+        if rng.random() < annotated:
+            selected = rng.sample(lines, rng.randint(1, min(5, len(lines))))
+            store.save(name, rng.choice(QUESTIONS), "It is a synthetic answer.", parse_label_lines(selected))
+    return image_folder, label_folder
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成 Rope3D 格式的合成数据集")
+    parser.add_argument("root")
+    parser.add_argument("--files", type=int, default=500, help="图像数量")
+    parser.add_argument("--boxes", type=int, default=30, help="每张图像的平均框数")
+    parser.add_argument("--annotated", type=float, default=0.5, help="带有标注的图像比例")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    image_folder, label_folder = generate(args.root, args.files, args.boxes, args.annotated, seed=args.seed)
+    print(f"已生成 {args.files} 张图像: {image_folder}, {label_folder}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""在合成数据集上测试不依赖界面的各个步骤，并与保存的基线比较
+
+每个步骤报告处理速度（条/秒）和 tracemalloc 统计的 Python 峰值内存。
+速度比基线低超过 --tolerance 时返回非零退出码，便于在提交前发现性能回退。
+
+    python -m benchmarks.pipeline --files 2000 --boxes 40 --save-baseline benchmarks/baseline.json
+    python -m benchmarks.pipeline --files 2000 --boxes 40 --baseline benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from annotation_core import AnnotationSession
+from annotation_store import open_store
+from image_index import ImageIndex
+from label_store import LabelStore
+from qa_index import QAIndex
+
+from benchmarks.fixtures import generate, IMAGE_WIDTH, IMAGE_HEIGHT
+
+CLICKS_PER_FRAME = 200
+CANVAS_SCALE = 0.5
+
+
+def stage_label_parse(data):
+    store = LabelStore(data["label_folder"])
+    return len(store)
+
+
+def stage_list_sort(data):
+    return len(ImageIndex.scan(data["image_folder"]))
+
+
+def stage_hit_test(data):
+    rng = random.Random(0)
+    session = AnnotationSession(data["label_store"], None)
+    clicks = 0
+    for name in data["names"]:
+        session.begin(name)
+        session.load_labels()
+        session.set_scale(CANVAS_SCALE, CANVAS_SCALE)
+        for _ in range(CLICKS_PER_FRAME):
+            session.toggle_at(rng.uniform(0, IMAGE_WIDTH * CANVAS_SCALE), rng.uniform(0, IMAGE_HEIGHT * CANVAS_SCALE))
+        clicks += CLICKS_PER_FRAME
+    return clicks
+
+
+def _save_load(data, backend):
+    root = tempfile.mkdtemp(prefix=f"bench_{backend}_")
+    store = open_store(root, backend)
+    try:
+        session = AnnotationSession(data["label_store"], store)
+        for name in data["names"]:
+            session.begin(name)
+            session.load_labels()
+            session.set_scale(CANVAS_SCALE, CANVAS_SCALE)
+            session.select_in_rect(0, 0, IMAGE_WIDTH * CANVAS_SCALE / 2, IMAGE_HEIGHT * CANVAS_SCALE)
+            session.save("Which cars are parked on the roadside?", "The two cars on the left.")
+            session.begin(name)
+            session.load_labels()
+            session.load_annotation()
+        return len(data["names"])
+    finally:
+        store.close()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def stage_save_load_txt(data):
+    return _save_load(data, "txt")
+
+
+def stage_save_load_sqlite(data):
+    return _save_load(data, "sqlite")
+
+
+def stage_checker_scan_cold(data):
+    # 与 question_checker.ipynb 中的统计相同，每次都从空索引开始
+    index_path = os.path.join(data["scratch"], "cold_index.json")
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    index = QAIndex(data["question_folder"], index_path=index_path)
+    index.update()
+    index.counts()
+    return len(index.files)
+
+
+def stage_checker_scan_warm(data):
+    index = QAIndex(data["question_folder"], index_path=os.path.join(data["scratch"], "warm_index.json"))
+    index.update()
+    index.counts()
+    return len(index.files)
+
+
+STAGES = {
+    "label_parse": stage_label_parse,
+    "list_sort": stage_list_sort,
+    "hit_test": stage_hit_test,
+    "save_load_txt": stage_save_load_txt,
+    "save_load_sqlite": stage_save_load_sqlite,
+    "checker_scan_cold": stage_checker_scan_cold,
+    "checker_scan_warm": stage_checker_scan_warm,
+}
+
+
+def measure(func, data, repeat):
+    """计时运行 repeat 次，再单独运行一次统计内存（tracemalloc 会明显拖慢速度），返回 (条数, 最短耗时, 峰值内存字节)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = func(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    try:
+        func(data)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return items, best, peak
+
+
+def run(root, stages, repeat):
+    scratch = tempfile.mkdtemp(prefix="bench_scratch_")
+    try:
+        data = {
+            "image_folder": os.path.join(root, "image_2"),
+            "label_folder": os.path.join(root, "label_2"),
+            "question_folder": os.path.join(root, "Questions"),
+            "scratch": scratch,
+        }
+        data["label_store"] = LabelStore(data["label_folder"])
+        data["names"] = data["label_store"].stems()
+        # 先建好热索引
+        QAIndex(data["question_folder"], index_path=os.path.join(scratch, "warm_index.json")).update()
+
+        results = {}
+        for name in stages:
+            items, seconds, peak = measure(STAGES[name], data, repeat)
+            results[name] = {"items": items, "seconds": seconds,
+                             "items_per_s": items / seconds if seconds else float("inf"),
+                             "peak_mb": peak / (1024 * 1024)}
+        return results
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def report(results, baseline=None, tolerance=0.2):
+    """打印结果，返回速度低于基线的步骤"""
+    regressions = []
+    print(f"{'stage':<20}{'items':>8}{'seconds':>10}{'items/s':>12}{'peak MB':>9}{'vs base':>9}")
+    for name, result in results.items():
+        compare = ""
+        base = (baseline or {}).get("stages", {}).get(name)
+        if base:
+            ratio = result["items_per_s"] / base["items_per_s"]
+            compare = f"{ratio:.2f}x"
+            if ratio < 1 - tolerance:
+                compare += " !"
+                regressions.append(name)
+        print(f"{name:<20}{result['items']:>8}{result['seconds']:>10.3f}{result['items_per_s']:>12.0f}"
+              f"{result['peak_mb']:>9.1f}{compare:>9}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="在合成数据集上测试各个步骤的速度和内存")
+    parser.add_argument("--data", help="已生成的数据集目录，不指定时在临时目录中生成")
+    parser.add_argument("--files", type=int, default=500, help="图像数量")
+    parser.add_argument("--boxes", type=int, default=30, help="每张图像的平均框数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="每个步骤运行的次数，取最短耗时")
+    parser.add_argument("--stages", nargs="+", choices=sorted(STAGES), default=list(STAGES))
+    parser.add_argument("--baseline", help="与这个基线文件比较")
+    parser.add_argument("--save-baseline", help="把结果保存为基线文件")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="速度下降超过这个比例视为回退")
+    args = parser.parse_args(argv)
+
+    params = {"files": args.files, "boxes": args.boxes, "seed": args.seed}
+    root = args.data or tempfile.mkdtemp(prefix="bench_data_")
+    try:
+        if not os.path.isdir(os.path.join(root, "label_2")):
+            start = time.perf_counter()
+            generate(root, args.files, args.boxes, seed=args.seed)
+            print(f"已生成合成数据集 {root}，用时 {time.perf_counter() - start:.1f}s")
+        results = run(root, args.stages, args.repeat)
+    finally:
+        if not args.data:
+            shutil.rmtree(root, ignore_errors=True)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        if baseline.get("params") != params:
+            print(f"注意：基线的参数 {baseline.get('params')} 与本次 {params} 不同")
+    regressions = report(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as file:
+            json.dump({"params": params, "python": sys.version.split()[0], "stages": results}, file, indent=1)
+        print(f"基线已保存到 {args.save_baseline}")
+    if regressions:
+        print(f"性能回退: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
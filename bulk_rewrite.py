@@ -0,0 +1,190 @@
+"""按规则文件批量改写问题和答案
+
+规则文件为 JSON Lines，每行一条规则:
+    {"old": "Where are pedestrians crossing the road", "new": "Where are pedestrians crossing the road?"}
+    {"old": "\\s+\\?$", "new": "?", "regex": true, "target": "questions"}
+
+exact 规则要求整个文件内容（去掉首尾空白）与 old 完全相同；regex 规则对内容做 re.sub。
+每个文件先应用 exact 规则，再按顺序应用 regex 规则。target 可以是 questions、answers 或 both（默认）。
+
+    python bulk_rewrite.py apply D:\\VQA\\validation rules.jsonl --dry-run
+    python bulk_rewrite.py apply D:\\VQA\\validation rules.jsonl
+    python bulk_rewrite.py undo D:\\VQA\\validation\\rewrite_journal_20240501_120000.jsonl
+"""
+import argparse
+import difflib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from atomic_io import atomic_write_text
+
+TARGET_FOLDERS = {"questions": "Questions", "answers": "Answers"}
+CHUNK_SIZE = 500
+
+
+def load_rules(path):
+    """读取规则文件，返回 {文件夹名: (exact 字典, [(正则, 替换)])}"""
+    rules = {folder: ({}, []) for folder in TARGET_FOLDERS.values()}
+    with open(path, 'r', encoding='utf-8') as file:
+        for line_number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rule = json.loads(line)
+                old, new = rule["old"], rule["new"]
+            except (ValueError, KeyError) as e:
+                raise ValueError(f"{path}:{line_number}: 无效的规则: {e}") from e
+            target = rule.get("target", "both")
+            if target == "both":
+                folders = TARGET_FOLDERS.values()
+            elif target in TARGET_FOLDERS:
+                folders = [TARGET_FOLDERS[target]]
+            else:
+                raise ValueError(f"{path}:{line_number}: 未知的 target: {target}")
+            for folder in folders:
+                exact, patterns = rules[folder]
+                if rule.get("regex"):
+                    patterns.append((re.compile(old), new))
+                else:
+                    exact[old] = new
+    return rules
+
+
+def rewrite_text(content, exact, patterns):
+    text = content.strip()
+    text = exact.get(text, text)
+    for pattern, replacement in patterns:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def plan_chunk(paths, exact, patterns):
+    """计算一批文件的改写结果（只读），返回 [(路径, 原内容, 新内容)]，在子进程中执行"""
+    changes = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8', newline='') as file:
+                content = file.read()
+        except (UnicodeDecodeError, OSError):
+            continue
+        text = rewrite_text(content, exact, patterns)
+        if text != content.strip():
+            changes.append((path, content, text + "\n"))
+    return changes
+
+
+def apply_chunk(changes):
+    """原子地写入一批改写结果，写之前确认文件没有被其他人改过，返回 (已写入, 跳过)"""
+    written, skipped = [], []
+    for path, old_content, new_content in changes:
+        try:
+            with open(path, 'r', encoding='utf-8', newline='') as file:
+                current = file.read()
+        except (UnicodeDecodeError, OSError):
+            skipped.append(path)
+            continue
+        if current != old_content:
+            skipped.append(path)
+            continue
+        atomic_write_text(path, new_content, newline='')
+        written.append(path)
+    return written, skipped
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _run_parallel(executor, function, chunks, *args):
+    if executor is None:
+        return [function(chunk, *args) for chunk in chunks]
+    return list(executor.map(function, chunks, *([arg] * len(chunks) for arg in args)))
+
+
+def plan_rewrite(root, rules, executor=None):
+    changes = []
+    for folder, (exact, patterns) in rules.items():
+        if not exact and not patterns:
+            continue
+        directory = os.path.join(root, folder)
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as entries:
+            paths = sorted(entry.path for entry in entries if entry.name.endswith(".txt") and entry.is_file())
+        for chunk_changes in _run_parallel(executor, plan_chunk, _chunks(paths), exact, patterns):
+            changes.extend(chunk_changes)
+    return changes
+
+
+def write_journal(journal_path, changes):
+    with open(journal_path, 'w', encoding='utf-8') as journal:
+        for path, old_content, new_content in changes:
+            journal.write(json.dumps({"path": path, "old": old_content, "new": new_content}, ensure_ascii=False) + "\n")
+
+
+def read_journal(journal_path):
+    with open(journal_path, 'r', encoding='utf-8') as journal:
+        return [(entry["path"], entry["old"], entry["new"]) for entry in map(json.loads, journal) if entry]
+
+
+def print_diff(changes):
+    for path, old_content, new_content in changes:
+        for line in difflib.unified_diff(old_content.splitlines(), new_content.splitlines(),
+                                         fromfile=path, tofile=path, lineterm=""):
+            print(line)
+
+
+def apply_changes(changes, executor=None):
+    written, skipped = [], []
+    for chunk_written, chunk_skipped in _run_parallel(executor, apply_chunk, _chunks(changes)):
+        written.extend(chunk_written)
+        skipped.extend(chunk_skipped)
+    return written, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按规则文件批量改写问题和答案")
+    parser.add_argument("--workers", type=int, default=None, help="进程数")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    apply_parser = subparsers.add_parser("apply", help="应用规则")
+    apply_parser.add_argument("root", help="Questions/Answers 所在的目录")
+    apply_parser.add_argument("rules", help="规则文件 (JSON Lines)")
+    apply_parser.add_argument("--dry-run", action="store_true", help="只显示差异，不修改文件")
+    apply_parser.add_argument("--journal", help="撤销日志路径，默认写到 root 下")
+
+    undo_parser = subparsers.add_parser("undo", help="根据撤销日志恢复文件")
+    undo_parser.add_argument("journal")
+    args = parser.parse_args(argv)
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        if args.command == "apply":
+            changes = plan_rewrite(args.root, load_rules(args.rules), executor)
+            if args.dry_run:
+                print_diff(changes)
+                print(f"将修改 {len(changes)} 个文件（dry run，未写入）")
+                return
+            if not changes:
+                print("没有需要修改的文件")
+                return
+            journal_path = args.journal or os.path.join(
+                args.root, time.strftime("rewrite_journal_%Y%m%d_%H%M%S.jsonl"))
+            # 先写日志再改文件，中途失败也能撤销
+            write_journal(journal_path, changes)
+        else:
+            journal_path = args.journal
+            changes = [(path, new, old) for path, old, new in read_journal(journal_path)]
+
+        written, skipped = apply_changes(changes, executor)
+
+    print(f"已修改 {len(written)} 个文件，撤销日志: {journal_path}")
+    for path in skipped:
+        print(f"已跳过（文件已被修改）: {path}")
+
+
+if __name__ == "__main__":
+    main()
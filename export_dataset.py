@@ -0,0 +1,259 @@
+"""把标注导出为训练用的分片数据集
+
+每条记录为一张图像的 (图像, 问题, 答案, 选中的框)，框的格式与 load_existing_annotations 中的字典相同:
+    {"name": "...", "image": "xxx.jpg", "question": "...", "answer": "...",
+     "bboxes": [{"type": "car", "truncated": 0, ..., "rotation_y": 1.57}, ...]}
+
+支持三种分片格式:
+    jsonl    每个分片一个 .jsonl 文件
+    parquet  每个分片一个 .parquet 文件（需要安装 pyarrow）
+    tar      每个分片一个 .tar 文件，每条记录为 <name>.json 和原始图像字节（webdataset 格式）
+
+分片由多个进程并行写出，每个进程一次只处理一个分片的记录。
+输出目录中的 manifest.json 记录已完成的分片，中断后再次运行同样的命令会跳过这些分片。
+
+    python export_dataset.py D:\\VQA\\validation D:\\VQA\\export --image-folder D:\\VQA\\validation\\image_2
+    python export_dataset.py D:\\VQA\\validation D:\\VQA\\export_tar --format tar --image-folder D:\\VQA\\validation\\image_2
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import tarfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from annotation_store import STORAGE_BACKENDS, open_store
+from atomic_io import atomic_write_text
+from image_index import ImageIndex
+from label_store import row_to_dict
+
+EXPORT_FORMATS = {"jsonl": ".jsonl", "parquet": ".parquet", "tar": ".tar"}
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+SHARD_SIZE = 1000
+PARQUET_ROW_GROUP = 256
+
+
+def make_record(name, annotation, image_path=None):
+    return {
+        "name": name,
+        "image": None if image_path is None else os.path.basename(image_path),
+        "question": annotation.question,
+        "answer": annotation.answer,
+        "bboxes": [] if annotation.labels is None else [row_to_dict(row) for row in annotation.labels],
+    }
+
+
+def iter_records(store, names, image_paths):
+    """按顺序逐条生成记录，image_paths 为 文件名(不带后缀) -> 图像路径"""
+    for name in names:
+        annotation = store.load(name)
+        if annotation is not None:
+            yield make_record(name, annotation, image_paths.get(name))
+
+
+def _write_jsonl(records, path):
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='\n') as file:
+        for record in records:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def _write_parquet(records, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    bbox_type = pa.struct([
+        ("type", pa.string()),
+        ("truncated", pa.int32()),
+        ("occluded", pa.int32()),
+        ("angle", pa.float64()),
+        ("bbox2d", pa.list_(pa.float64(), 4)),
+        ("dimensions", pa.list_(pa.float64(), 3)),
+        ("position", pa.list_(pa.float64(), 3)),
+        ("rotation_y", pa.float64()),
+    ])
+    schema = pa.schema([
+        ("name", pa.string()),
+        ("image", pa.string()),
+        ("question", pa.string()),
+        ("answer", pa.string()),
+        ("bboxes", pa.list_(bbox_type)),
+    ])
+    count = 0
+    batch = []
+    with pq.ParquetWriter(path, schema) as writer:
+        for record in records:
+            batch.append(record)
+            if len(batch) >= PARQUET_ROW_GROUP:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+def _write_tar(records, path, image_paths):
+    def add_bytes(tar, member_name, data):
+        info = tarfile.TarInfo(member_name)
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+
+    count = 0
+    with tarfile.open(path, 'w') as tar:
+        for record in records:
+            add_bytes(tar, f"{record['name']}.json", json.dumps(record, ensure_ascii=False).encode('utf-8'))
+            image_path = image_paths.get(record["name"])
+            if image_path is not None:
+                extension = os.path.splitext(image_path)[1].lower()
+                with open(image_path, 'rb') as file:
+                    add_bytes(tar, f"{record['name']}{extension}", file.read())
+            count += 1
+    return count
+
+
+def shard_file_name(shard_id, export_format):
+    return f"shard-{shard_id:05d}{EXPORT_FORMATS[export_format]}"
+
+
+def export_shard(job):
+    """写出一个分片，返回 (分片编号, 文件名, 记录数)；在子进程中执行"""
+    shard_id, names, root, backend, image_paths, output_dir, export_format = job
+    file_name = shard_file_name(shard_id, export_format)
+    temp_path = os.path.join(output_dir, f".tmp_{file_name}")
+    store = open_store(root, backend)
+    try:
+        records = iter_records(store, names, image_paths)
+        if export_format == "jsonl":
+            count = _write_jsonl(records, temp_path)
+        elif export_format == "parquet":
+            count = _write_parquet(records, temp_path)
+        else:
+            count = _write_tar(records, temp_path, image_paths)
+    finally:
+        store.close()
+    os.replace(temp_path, os.path.join(output_dir, file_name))
+    return shard_id, file_name, count
+
+
+def _names_digest(names):
+    digest = hashlib.sha1()
+    for name in names:
+        digest.update(name.encode('utf-8') + b"\n")
+    return digest.hexdigest()
+
+
+def load_manifest(output_dir, settings):
+    """读取已完成的分片；导出参数或图像列表变化时删除旧分片，从头开始"""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {**settings, "shards": {}}
+    if {key: manifest.get(key) for key in settings} == settings:
+        return manifest
+    print("导出参数或标注列表已变化，重新导出全部分片")
+    for shard in manifest.get("shards", {}).values():
+        try:
+            os.remove(os.path.join(output_dir, shard["file"]))
+        except OSError:
+            pass
+    return {**settings, "shards": {}}
+
+
+def save_manifest(output_dir, manifest):
+    atomic_write_text(os.path.join(output_dir, MANIFEST_NAME), json.dumps(manifest, ensure_ascii=False, indent=1))
+
+
+def export_dataset(root, output_dir, backend="txt", image_folder=None, export_format="jsonl",
+                   shard_size=SHARD_SIZE, workers=None):
+    """导出全部标注，返回 manifest；同一时间最多有 2 * workers 个分片在处理"""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"未知的导出格式: {export_format}")
+    if export_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError("导出 parquet 需要安装 pyarrow: pip install pyarrow")
+    if export_format == "tar" and image_folder is None:
+        raise ValueError("tar 格式需要指定图像文件夹")
+
+    os.makedirs(output_dir, exist_ok=True)
+    store = open_store(root, backend)
+    try:
+        names = store.names()
+    finally:
+        store.close()
+    image_index = ImageIndex.load(image_folder) if image_folder else None
+
+    # 换了数据来源时即使图像名相同，旧分片的内容也不能继续使用
+    settings = {"version": MANIFEST_VERSION, "format": export_format, "shard_size": shard_size,
+                "backend": backend, "root": os.path.abspath(root),
+                "image_folder": os.path.abspath(image_folder) if image_folder else None,
+                "names_sha1": _names_digest(names), "total_names": len(names)}
+    manifest = load_manifest(output_dir, settings)
+    done = manifest["shards"]
+
+    def jobs():
+        for shard_id, start in enumerate(range(0, len(names), shard_size)):
+            if str(shard_id) in done:
+                continue
+            shard_names = names[start:start + shard_size]
+            image_paths = {}
+            if image_index is not None:
+                for name in shard_names:
+                    path = image_index.path_of(name)
+                    if path is not None:
+                        image_paths[name] = path
+            yield shard_id, shard_names, root, backend, image_paths, output_dir, export_format
+
+    total_shards = (len(names) + shard_size - 1) // shard_size
+    print(f"{len(names)} 条标注，{total_shards} 个分片，已完成 {len(done)} 个")
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        max_pending = 2 * workers
+        pending = set()
+        job_iter = jobs()
+        while True:
+            for job in job_iter:
+                pending.add(executor.submit(export_shard, job))
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                shard_id, file_name, count = future.result()
+                done[str(shard_id)] = {"file": file_name, "count": count}
+                print(f"分片 {shard_id + 1}/{total_shards}: {count} 条")
+            save_manifest(output_dir, manifest)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把标注导出为分片的训练数据集")
+    parser.add_argument("root", help="Questions/Answers/Labels 所在的目录")
+    parser.add_argument("output_dir")
+    parser.add_argument("--backend", choices=STORAGE_BACKENDS, default="txt", help="标注的存储方式")
+    parser.add_argument("--image-folder", help="图像文件夹，记录中会包含图像文件名（tar 格式时包含图像内容）")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="jsonl")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="每个分片的标注数")
+    parser.add_argument("--workers", type=int, default=None, help="进程数")
+    args = parser.parse_args(argv)
+
+    try:
+        manifest = export_dataset(args.root, args.output_dir, args.backend, args.image_folder, args.format,
+                                  args.shard_size, args.workers)
+    except (ValueError, RuntimeError) as e:
+        parser.error(str(e))
+    print(f"已导出 {sum(shard['count'] for shard in manifest['shards'].values())} 条记录到 {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+# 预取前后各多少张图像
+PREFETCH_RADIUS = 3
+# 缓存占用上限（字节），1920x1080 RGB 约 6MB 一张
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# 已缩放到画布尺寸的图像以及对应的缩放比例
+DisplayImage = namedtuple("DisplayImage", ["image", "scale_x", "scale_y", "nbytes"])
+
+# cv2 的降采样读取标志；cv2 导入较慢，JPEG 只用 PIL 解码，其他格式用到时才导入
+REDUCED_READ_FLAGS = {
+    1: "IMREAD_COLOR",
+    2: "IMREAD_REDUCED_COLOR_2",
+    4: "IMREAD_REDUCED_COLOR_4",
+    8: "IMREAD_REDUCED_COLOR_8",
+}
+
+
+def decode_full_resolution(image_path):
+    """按原分辨率读取图像并转换为 RGB 的 PIL 图像，失败时返回 None"""
+    import cv2
+    image = cv2.imread(image_path)
+    if image is None:
+        return None
+    return Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+
+def decode_for_display_full(image_path, canvas_width, canvas_height):
+    """原来的显示路径：解码全分辨率图像后再缩放到画布尺寸"""
+    image_pil = decode_full_resolution(image_path)
+    if image_pil is None:
+        return None
+
+    original_width, original_height = image_pil.size
+    scale_x = canvas_width / original_width
+    scale_y = canvas_height / original_height
+
+    new_width = int(original_width * scale_x)
+    new_height = int(original_height * scale_y)
+    image_pil = image_pil.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    return DisplayImage(image_pil, scale_x, scale_y, new_width * new_height * 3)
+
+
+def reduction_factor(original_width, original_height, canvas_width, canvas_height):
+    """在解码结果不小于画布尺寸的前提下，选择最大的缩小倍数"""
+    for factor in (8, 4, 2):
+        if original_width // factor >= canvas_width and original_height // factor >= canvas_height:
+            return factor
+    return 1
+
+
+def fit_size(original_width, original_height, canvas_width, canvas_height):
+    """保持宽高比放进画布后的 (宽, 高, 缩放比例)"""
+    scale = min(canvas_width / original_width, canvas_height / original_height)
+    return max(1, round(original_width * scale)), max(1, round(original_height * scale)), scale
+
+
+def decode_for_display(image_path, canvas_width, canvas_height):
+    """按画布尺寸降采样解码，并保持宽高比缩放到画布内，失败时返回 None
+
+    JPEG 通过 PIL 的 draft() 让解码器直接输出 1/2、1/4 或 1/8 尺寸的 RGB 图像；
+    其他格式使用 cv2 的 IMREAD_REDUCED_COLOR_* 读取。缩放比例始终相对于原图尺寸计算，
+    框坐标不受降采样影响。
+    """
+    try:
+        with Image.open(image_path) as image:
+            original_width, original_height = image.size
+            width, height, scale = fit_size(original_width, original_height, canvas_width, canvas_height)
+            if image.format == "JPEG":
+                image.draft("RGB", (width, height))
+                image_pil = image.convert("RGB")
+            else:
+                image_pil = None
+    except OSError:
+        # PIL 无法识别的格式交给 cv2 按原来的方式处理
+        image_pil = decode_full_resolution(image_path)
+        if image_pil is None:
+            return None
+        original_width, original_height = image_pil.size
+        width, height, scale = fit_size(original_width, original_height, canvas_width, canvas_height)
+
+    if image_pil is None:
+        import cv2
+        factor = reduction_factor(original_width, original_height, width, height)
+        image = cv2.imread(image_path, getattr(cv2, REDUCED_READ_FLAGS[factor]))
+        if image is None:
+            return None
+        image_pil = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+    if image_pil.size != (width, height):
+        image_pil = image_pil.resize((width, height), Image.Resampling.LANCZOS)
+    return DisplayImage(image_pil, scale, scale, width * height * 3)
+
+
+class ImageCache:
+    """按字节数限制容量的 LRU 缓存，线程安全"""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old.nbytes
+            # 单个条目超过上限时不缓存
+            if entry.nbytes > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self.current_bytes += entry.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats_text(self):
+        """状态栏显示用的统计信息"""
+        with self._lock:
+            return (f"缓存 命中: {self.hits}  未命中: {self.misses}  "
+                    f"已缓存: {len(self._entries)} 张 / {self.current_bytes / (1024 * 1024):.1f} MB")
+
+
+class ImagePrefetcher:
+    """在线程池中提前解码并缩放当前图像前后的若干张图像"""
+
+    def __init__(self, cache, radius=PREFETCH_RADIUS, max_workers=2, decoder=decode_for_display):
+        self.cache = cache
+        self.radius = radius
+        self.decoder = decoder
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _decode_into_cache(self, key):
+        image_path, canvas_width, canvas_height = key
+        try:
+            entry = self.decoder(image_path, canvas_width, canvas_height)
+            if entry is not None:
+                self.cache.put(key, entry)
+            return entry
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def fetch(self, image_path, canvas_width, canvas_height):
+        """返回缩放好的图像：命中缓存直接返回，否则等待预取结果或同步解码"""
+        key = (image_path, canvas_width, canvas_height)
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None and future.cancel():
+                # 任务尚未开始，直接在当前线程解码更快
+                del self._pending[key]
+                future = None
+        if future is not None:
+            # 已经在后台解码，等待结果即可
+            entry = future.result()
+            if entry is not None:
+                return entry
+
+        entry = self.decoder(image_path, canvas_width, canvas_height)
+        if entry is not None:
+            self.cache.put(key, entry)
+        return entry
+
+    def prefetch_around(self, image_files, index, canvas_width, canvas_height):
+        """提交当前索引前后 radius 张图像的预取任务，并取消不再需要的任务"""
+        if not image_files:
+            return
+        count = len(image_files)
+        wanted = []
+        for offset in range(1, self.radius + 1):
+            for neighbor in (index + offset, index - offset):
+                key = (image_files[neighbor % count], canvas_width, canvas_height)
+                if key not in wanted:
+                    wanted.append(key)
+
+        with self._lock:
+            # 取消尚未开始、且已不在预取范围内的任务
+            for key, future in list(self._pending.items()):
+                if key not in wanted and future.cancel():
+                    del self._pending[key]
+
+            for key in wanted:
+                if key in self._pending or key in self.cache:
+                    continue
+                self._pending[key] = self._executor.submit(self._decode_into_cache, key)
+
+    def shutdown(self):
+        with self._lock:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,100 @@
+import json
+import os
+import re
+
+from atomic_io import atomic_write_text
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+INDEX_VERSION = 1
+
+_DIGITS = re.compile('([0-9]+)')
+
+
+def natural_sort_key(s):
+    # 使用正则表达式分割字符串中的数字部分和非数字部分
+    return [int(text) if text.isdigit() else text.lower() for text in _DIGITS.split(s)]
+
+
+def list_frames(rope3d_path):
+    """标签文件夹中按自然顺序排列的文件名（不带后缀）"""
+    with os.scandir(rope3d_path) as entries:
+        names = [entry.name[:-4] for entry in entries if entry.name.endswith(".txt") and entry.is_file()]
+    return sorted(names, key=natural_sort_key)
+
+
+def find_image(directory, stem):
+    """不使用索引直接查找 文件名(不带后缀) 对应的图像，找不到时返回 None"""
+    for extension in IMAGE_EXTENSIONS:
+        for suffix in (extension, extension.upper()):
+            path = os.path.join(directory, stem + suffix)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def default_index_path(directory):
+    directory = os.path.normpath(directory)
+    return os.path.join(os.path.dirname(directory), f".{os.path.basename(directory)}_image_index.json")
+
+
+class ImageIndex:
+    """图像文件夹中按自然顺序排列的文件列表，以及 文件名(不带后缀) -> 序号 的字典
+
+    排好序的列表保存在缓存文件中，文件夹的 mtime 没有变化时直接使用，不再重新排序。
+    """
+
+    def __init__(self, directory, names):
+        self.directory = directory
+        self.names = names
+        self.files = [os.path.join(directory, name) for name in names]
+        self.stems = {}
+        for index, name in enumerate(names):
+            # 同名不同后缀时使用排在前面的文件
+            self.stems.setdefault(os.path.splitext(name)[0], index)
+
+    def __len__(self):
+        return len(self.files)
+
+    def __getitem__(self, index):
+        return self.files[index]
+
+    def index_of(self, stem):
+        """文件名(不带后缀)对应的序号，不存在时返回 None"""
+        return self.stems.get(stem)
+
+    def path_of(self, stem):
+        index = self.stems.get(stem)
+        return None if index is None else self.files[index]
+
+    @staticmethod
+    def scan(directory):
+        """列出并排序文件夹中的图像，每个文件名只计算一次排序键"""
+        with os.scandir(directory) as entries:
+            keyed = [(natural_sort_key(entry.name), entry.name) for entry in entries
+                     if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file()]
+        keyed.sort()
+        return [name for _, name in keyed]
+
+    @classmethod
+    def load(cls, directory, index_path=None):
+        """读取缓存的索引，文件夹有变化时重新扫描并更新缓存"""
+        index_path = index_path or default_index_path(directory)
+        dir_mtime = os.stat(directory).st_mtime_ns
+        try:
+            with open(index_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if (data.get("version") == INDEX_VERSION and data.get("dir_mtime_ns") == dir_mtime
+                    and data.get("directory") == os.path.abspath(directory)):
+                return cls(directory, data["names"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+        names = cls.scan(directory)
+        data = {"version": INDEX_VERSION, "directory": os.path.abspath(directory),
+                "dir_mtime_ns": dir_mtime, "names": names}
+        try:
+            atomic_write_text(index_path, json.dumps(data, ensure_ascii=False))
+        except OSError:
+            # 没有写权限时只是每次都重新扫描
+            pass
+        return cls(directory, names)
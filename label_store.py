@@ -0,0 +1,203 @@
+import os
+
+import numpy as np
+
+# KITTI/Rope3D 标签每一行的列，bbox2d/dimensions/position 为定长子数组
+LABEL_DTYPE = np.dtype([
+    ("type", "U24"),
+    ("truncated", "i4"),
+    ("occluded", "i4"),
+    ("angle", "f8"),
+    ("bbox2d", "f8", (4,)),
+    ("dimensions", "f8", (3,)),
+    ("position", "f8", (3,)),
+    ("rotation_y", "f8"),
+])
+# 一行完整标签的字段数（parts[0] ~ parts[14]）
+LABEL_FIELD_COUNT = 15
+
+
+def parse_label_parts(parts):
+    """把一行拆分后的字段转换为 LABEL_DTYPE 的一行，字段无法转换时抛出 ValueError"""
+    return (
+        parts[0],
+        int(parts[1]),
+        int(parts[2]),
+        float(parts[3]),
+        [float(parts[4]), float(parts[5]), float(parts[6]), float(parts[7])],
+        [float(parts[8]), float(parts[9]), float(parts[10])],
+        [float(parts[11]), float(parts[12]), float(parts[13])],
+        float(parts[14]),
+    )
+
+
+def _parse_into(lines, rows):
+    """把标签行解析后追加到 rows，返回追加的行数；字段不足或无法解析的行会被跳过"""
+    count = 0
+    for line in lines:
+        parts = line.split()
+        if len(parts) < LABEL_FIELD_COUNT:
+            continue
+        try:
+            rows.append(parse_label_parts(parts))
+        except ValueError:
+            continue
+        count += 1
+    return count
+
+
+def parse_label_lines(lines):
+    """把标签文本行解析为 LABEL_DTYPE 结构化数组"""
+    rows = []
+    _parse_into(lines, rows)
+    return np.array(rows, dtype=LABEL_DTYPE)
+
+
+def read_label_file(path):
+    with open(path, 'r') as file:
+        return parse_label_lines(file)
+
+
+def format_label_row(row):
+    """把一行标签格式化为文本，格式与原来 save_annotation 写出的一致"""
+    values = [
+        str(row["type"]),
+        int(row["truncated"]),
+        int(row["occluded"]),
+        float(row["angle"]),
+        *(float(v) for v in row["bbox2d"]),
+        *(float(v) for v in row["dimensions"]),
+        *(float(v) for v in row["position"]),
+        float(row["rotation_y"]),
+    ]
+    return " ".join(map(str, values))
+
+
+def row_to_dict(row):
+    """转换为原来 load_bboxes 使用的字典结构"""
+    return {
+        "type": str(row["type"]),
+        "truncated": int(row["truncated"]),
+        "occluded": int(row["occluded"]),
+        "angle": float(row["angle"]),
+        "bbox2d": [float(v) for v in row["bbox2d"]],
+        "dimensions": [float(v) for v in row["dimensions"]],
+        "position": [float(v) for v in row["position"]],
+        "rotation_y": float(row["rotation_y"]),
+    }
+
+
+class LabelFiles:
+    """与 LabelStore 的 refresh/get 接口相同，但每次只读取需要的那一个标签文件
+
+    LabelStore 在后台扫描整个文件夹期间，标注窗口先用它读取当前图像的标签。
+    """
+
+    def __init__(self, label_dir):
+        self.label_dir = label_dir
+
+    def refresh(self, force=False):
+        return False
+
+    def get(self, stem):
+        try:
+            return read_label_file(os.path.join(self.label_dir, f"{stem}.txt"))
+        except (OSError, UnicodeDecodeError):
+            return None
+
+
+class LabelStore:
+    """一次性扫描标签文件夹，把所有标签存成一个结构化数组，按文件名索引
+
+    目录的 mtime 变化时才重新扫描，并且只重新解析新增或修改过的文件。
+    """
+
+    def __init__(self, label_dir):
+        self.label_dir = label_dir
+        self.records = np.empty(0, dtype=LABEL_DTYPE)
+        self._index = {}  # 文件名(不带后缀) -> (start, stop)
+        self._mtimes = {}  # 文件名(不带后缀) -> mtime_ns
+        self._dir_mtime = None
+        self.refresh()
+
+    def __contains__(self, stem):
+        return stem in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def stems(self):
+        return sorted(self._index)
+
+    def get(self, stem):
+        """返回该文件的全部标签（数组切片），文件不存在时返回 None"""
+        span = self._index.get(stem)
+        if span is None:
+            return None
+        return self.records[span[0]:span[1]]
+
+    def refresh(self, force=False):
+        """目录有变化时增量更新，返回是否做了更新"""
+        try:
+            dir_mtime = os.stat(self.label_dir).st_mtime_ns
+        except OSError:
+            self._reset()
+            return False
+        if not force and dir_mtime == self._dir_mtime:
+            return False
+
+        current = {}
+        with os.scandir(self.label_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".txt") and entry.is_file():
+                    current[entry.name[:-4]] = entry.stat().st_mtime_ns
+
+        changed = [stem for stem, mtime in current.items()
+                   if force or self._mtimes.get(stem) != mtime or stem not in self._index]
+        removed = [stem for stem in self._index if stem not in current]
+        self._dir_mtime = dir_mtime
+        if not changed and not removed:
+            return False
+
+        # 保留未变化文件的行，重新计算它们的偏移
+        stale = set(changed).union(removed)
+        keep = np.ones(len(self.records), dtype=bool)
+        for stem in stale:
+            span = self._index.pop(stem, None)
+            if span is not None:
+                keep[span[0]:span[1]] = False
+            self._mtimes.pop(stem, None)
+
+        new_index = {}
+        position = 0
+        for stem, (start, stop) in sorted(self._index.items(), key=lambda item: item[1][0]):
+            new_index[stem] = (position, position + stop - start)
+            position += stop - start
+        kept = self.records[keep]
+
+        # 解析新增或修改过的文件
+        rows = []
+        for stem in changed:
+            path = os.path.join(self.label_dir, f"{stem}.txt")
+            # 先解析到单独的列表，读到一半出错时不会在 rows 中留下这个文件的行
+            file_rows = []
+            try:
+                with open(path, 'r') as file:
+                    count = _parse_into(file, file_rows)
+            except (OSError, UnicodeDecodeError):
+                continue
+            rows.extend(file_rows)
+            new_index[stem] = (position, position + count)
+            self._mtimes[stem] = current[stem]
+            position += count
+
+        parsed = np.array(rows, dtype=LABEL_DTYPE)
+        self.records = np.concatenate([kept, parsed]) if len(kept) else parsed
+        self._index = new_index
+        return True
+
+    def _reset(self):
+        self.records = np.empty(0, dtype=LABEL_DTYPE)
+        self._index = {}
+        self._mtimes = {}
+        self._dir_mtime = None
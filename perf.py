@@ -0,0 +1,148 @@
+import csv
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# 每个计时段保留最近多少次耗时用于计算 p50/p95
+SPAN_WINDOW = 200
+# 日志文件超过这个大小后改名为 .1 并重新开始
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_FLUSH_EVERY = 50
+
+logger = logging.getLogger("vqa")
+
+
+def configure_logging(level="WARNING"):
+    """设置调试输出的级别，默认 WARNING，此时 debug/info 的输出不会被格式化"""
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class SpanLog:
+    """把计时结果追加到 CSV 或 JSONL 文件（按后缀判断），超过 max_bytes 后滚动"""
+
+    FIELDS = ("time", "span", "ms", "thread")
+
+    def __init__(self, path, max_bytes=LOG_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.is_csv = path.lower().endswith(".csv")
+        self._lines = []
+
+    def append(self, timestamp, name, seconds, thread_name):
+        if self.is_csv:
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator="\n").writerow(
+                (f"{timestamp:.3f}", name, f"{seconds * 1000:.3f}", thread_name))
+            self._lines.append(buffer.getvalue())
+        else:
+            self._lines.append(json.dumps({"time": round(timestamp, 3), "span": name,
+                                           "ms": round(seconds * 1000, 3), "thread": thread_name}) + "\n")
+        if len(self._lines) >= LOG_FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        if not self._lines:
+            return
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+            write_header = self.is_csv and not os.path.exists(self.path)
+            with open(self.path, 'a', encoding='utf-8', newline='') as file:
+                if write_header:
+                    file.write(",".join(self.FIELDS) + "\n")
+                file.writelines(self._lines)
+        except OSError as e:
+            logger.warning("无法写入计时日志 %s: %s", self.path, e)
+        self._lines = []
+
+
+class SpanRecorder:
+    """命名计时段：with recorder.span("load_bboxes"): ...
+
+    enabled 为 False 时 span() 直接返回空的上下文管理器，不计时也不写日志。
+    可以在多个线程中使用。
+    """
+
+    def __init__(self, enabled=True, log_path=None, window=SPAN_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self.log = SpanLog(log_path) if log_path else None
+        self._durations = {}  # 名称 -> 最近的耗时（秒）
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self._lock:
+            durations = self._durations.get(name)
+            if durations is None:
+                durations = self._durations[name] = deque(maxlen=self.window)
+            durations.append(seconds)
+            if self.log is not None:
+                self.log.append(time.time(), name, seconds, threading.current_thread().name)
+
+    def stats(self):
+        """{名称: (次数, p50 秒, p95 秒)}，次数为窗口内的次数"""
+        with self._lock:
+            snapshot = {name: list(durations) for name, durations in self._durations.items()}
+        return {name: (len(values), percentile(values, 0.5), percentile(values, 0.95))
+                for name, values in snapshot.items() if values}
+
+    def stats_text(self):
+        lines = [f"{'span':<26}{'n':>5}{'p50 ms':>9}{'p95 ms':>9}"]
+        for name, (count, p50, p95) in sorted(self.stats().items()):
+            lines.append(f"{name:<26}{count:>5}{p50 * 1000:>9.1f}{p95 * 1000:>9.1f}")
+        return "\n".join(lines)
+
+    def close(self):
+        if self.log is not None:
+            with self._lock:
+                self.log.flush()
+
+
+class StartupTimer:
+    """记录启动后各阶段完成的时间（距 started_at 的秒数），同时记入 SpanRecorder
+
+    只记录每个阶段第一次完成的时间，report() 返回可以直接输出的文本。
+    """
+
+    def __init__(self, started_at, recorder=None):
+        self.started_at = started_at
+        self.recorder = recorder
+        self.marks = {}  # 阶段 -> 秒数，按完成顺序
+
+    def mark(self, name, at=None):
+        if name in self.marks:
+            return
+        seconds = (time.perf_counter() if at is None else at) - self.started_at
+        self.marks[name] = seconds
+        if self.recorder is not None:
+            self.recorder.record(f"startup_{name}", seconds)
+
+    def report(self):
+        lines = [f"{'startup':<22}{'ms':>9}"]
+        for name, seconds in self.marks.items():
+            lines.append(f"{name:<22}{seconds * 1000:>9.1f}")
+        return "\n".join(lines)
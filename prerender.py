@@ -0,0 +1,196 @@
+"""把图像文件夹预先缩放到画布尺寸，保存到缓存文件夹
+
+标注窗口发现缓存后，打开图像时只需读取一个已缩放好的小文件，不再解码原图和缩放。
+源文件的 mtime 或大小变化后，对应的缓存会失效并在下次运行时重新生成。
+
+画布尺寸默认使用标注窗口上次保存在 settings.json 中的实际画布尺寸（需要在同一目录下运行），
+没有时为 1920x1080。窗口比生成缓存时小的时候从缓存缩小，比缓存大的时候解码原图。
+
+    python prerender.py D:\\Rope3D\\image_2
+    python prerender.py D:\\Rope3D\\image_2 --width 1920 --height 1080 --format webp --quality 85
+"""
+import argparse
+import json
+import os
+import time
+from multiprocessing import Pool
+
+from PIL import Image
+
+from atomic_io import atomic_write_text
+from image_cache import DisplayImage, decode_for_display, fit_size
+from image_index import IMAGE_EXTENSIONS
+from setting import load_settings
+
+MANIFEST_NAME = "manifest.json"
+# 2: 保持宽高比缩放，不再拉伸到整个画布
+# 3: 记录原图和缓存图像的尺寸，按显示尺寸匹配
+MANIFEST_VERSION = 3
+DEFAULT_CANVAS_SIZE = (1920, 1080)
+FORMAT_EXTENSIONS = {"jpeg": ".jpg", "webp": ".webp"}
+
+
+def default_cache_dir(image_folder):
+    image_folder = os.path.normpath(image_folder)
+    return os.path.join(os.path.dirname(image_folder), f"{os.path.basename(image_folder)}_display_cache")
+
+
+def render_one(job):
+    """解码并缩放一张图像写入缓存，返回 (文件名, 清单条目)，失败时条目为 None；在子进程中执行"""
+    image_path, cache_dir, width, height, image_format, quality = job
+    filename = os.path.basename(image_path)
+    stat = os.stat(image_path)
+    entry = decode_for_display(image_path, width, height)
+    if entry is None:
+        return filename, None
+    try:
+        with Image.open(image_path) as source:
+            src_width, src_height = source.size
+    except OSError:
+        # PIL 无法识别的格式由 cv2 解码，从缩放比例换算原图尺寸
+        src_width, src_height = round(entry.image.width / entry.scale_x), round(entry.image.height / entry.scale_y)
+    cache_file = filename + FORMAT_EXTENSIONS[image_format]
+    temp_path = os.path.join(cache_dir, f".tmp_{cache_file}")
+    entry.image.save(temp_path, format=image_format.upper(), quality=quality)
+    os.replace(temp_path, os.path.join(cache_dir, cache_file))
+    return filename, {
+        "file": cache_file,
+        "src_mtime_ns": stat.st_mtime_ns,
+        "src_size": stat.st_size,
+        "src_width": src_width,
+        "src_height": src_height,
+        "width": entry.image.width,
+        "height": entry.image.height,
+    }
+
+
+class PrerenderCache:
+    """读取 prerender.py 生成的缓存，只返回与源文件一致、且不小于显示尺寸的图像"""
+
+    def __init__(self, cache_dir, manifest):
+        self.cache_dir = cache_dir
+        self.width = manifest["width"]
+        self.height = manifest["height"]
+        self.images = manifest["images"]
+
+    @classmethod
+    def open(cls, cache_dir):
+        """缓存不存在或无法读取时返回 None"""
+        try:
+            with open(os.path.join(cache_dir, MANIFEST_NAME), 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+            if manifest.get("version") != MANIFEST_VERSION:
+                return None
+            return cls(cache_dir, manifest)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def lookup(self, image_path, canvas_width, canvas_height):
+        entry = self.images.get(os.path.basename(image_path))
+        if entry is None:
+            return None
+        width, height, scale = fit_size(entry["src_width"], entry["src_height"], canvas_width, canvas_height)
+        if entry["width"] < width or entry["height"] < height:
+            return None
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        if stat.st_mtime_ns != entry["src_mtime_ns"] or stat.st_size != entry["src_size"]:
+            return None
+        try:
+            with Image.open(os.path.join(self.cache_dir, entry["file"])) as image:
+                image = image.convert("RGB")
+        except OSError:
+            return None
+        if image.size != (width, height):
+            # 画布比生成缓存时小，从缓存缩小仍比解码原图快
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        return DisplayImage(image, scale, scale, width * height * 3)
+
+
+def load_manifest(cache_dir, width, height, image_format, quality):
+    """读取已有清单；画布尺寸、格式或质量不同时整个缓存作废"""
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_NAME), 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+        if (manifest.get("version"), manifest["width"], manifest["height"], manifest["format"],
+                manifest["quality"]) == (MANIFEST_VERSION, width, height, image_format, quality):
+            return manifest
+    except (OSError, ValueError, KeyError):
+        pass
+    return {"version": MANIFEST_VERSION, "width": width, "height": height, "format": image_format,
+            "quality": quality, "images": {}}
+
+
+def save_manifest(cache_dir, manifest):
+    atomic_write_text(os.path.join(cache_dir, MANIFEST_NAME), json.dumps(manifest, ensure_ascii=False))
+
+
+def prerender(image_folder, cache_dir, width, height, image_format="jpeg", quality=90, workers=None):
+    """生成或更新缓存，返回 (重新生成的数量, 失败的文件名)"""
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = load_manifest(cache_dir, width, height, image_format, quality)
+    images = manifest["images"]
+
+    jobs = []
+    current = set()
+    with os.scandir(image_folder) as entries:
+        for entry in entries:
+            if not entry.name.lower().endswith(IMAGE_EXTENSIONS) or not entry.is_file():
+                continue
+            current.add(entry.name)
+            stat = entry.stat()
+            cached = images.get(entry.name)
+            if cached is None or cached["src_mtime_ns"] != stat.st_mtime_ns or cached["src_size"] != stat.st_size:
+                jobs.append((entry.path, cache_dir, width, height, image_format, quality))
+
+    # 删除源文件已不存在的缓存
+    for filename in [name for name in images if name not in current]:
+        try:
+            os.remove(os.path.join(cache_dir, images.pop(filename)["file"]))
+        except OSError:
+            pass
+
+    failed = []
+    with Pool(processes=workers) as pool:
+        for done, (filename, entry) in enumerate(pool.imap_unordered(render_one, jobs, chunksize=8), 1):
+            if entry is None:
+                failed.append(filename)
+            else:
+                images[filename] = entry
+            if done % 500 == 0:
+                # 定期保存清单，中断后可以继续
+                save_manifest(cache_dir, manifest)
+                print(f"{done}/{len(jobs)}")
+    save_manifest(cache_dir, manifest)
+    return len(jobs) - len(failed), failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="预先把图像缩放到画布尺寸")
+    parser.add_argument("image_folder")
+    parser.add_argument("--cache-dir", help="缓存文件夹，默认为图像文件夹旁边的 <文件夹名>_display_cache")
+    parser.add_argument("--width", type=int, help="画布宽度，默认为标注窗口保存的画布宽度")
+    parser.add_argument("--height", type=int, help="画布高度，默认为标注窗口保存的画布高度")
+    parser.add_argument("--format", choices=sorted(FORMAT_EXTENSIONS), default="jpeg")
+    parser.add_argument("--quality", type=int, default=90)
+    parser.add_argument("--workers", type=int, default=None, help="进程数")
+    args = parser.parse_args(argv)
+
+    settings = load_settings()
+    width = args.width or settings.get("canvas_width") or DEFAULT_CANVAS_SIZE[0]
+    height = args.height or settings.get("canvas_height") or DEFAULT_CANVAS_SIZE[1]
+    print(f"画布尺寸: {width}x{height}")
+
+    start = time.perf_counter()
+    cache_dir = args.cache_dir or default_cache_dir(args.image_folder)
+    rendered, failed = prerender(args.image_folder, cache_dir, width, height,
+                                 args.format, args.quality, args.workers)
+    print(f"已生成 {rendered} 张，用时 {time.perf_counter() - start:.1f}s，缓存: {cache_dir}")
+    for filename in failed:
+        print(f"无法读取: {filename}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Questions/Answers 文件夹的倒排索引
+
+第一次使用时用进程池并行读取所有文件，之后只重新读取 mtime 或大小变化过的文件。
+索引保存在文件夹旁边的 .<文件夹名>_index.json 中。
+
+    python qa_index.py D:\\VQA\\validation count
+    python qa_index.py D:\\VQA\\validation count --answers --normalized
+    python qa_index.py D:\\VQA\\validation find "Where are pedestrians crossing the road?"
+    python qa_index.py D:\\VQA\\validation replace "Where are pedestrians crossing the road" "Where are pedestrians crossing the road?"
+"""
+import argparse
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from atomic_io import atomic_write_text
+
+INDEX_VERSION = 1
+# 需要读取的文件超过这个数量时才使用进程池
+PARALLEL_THRESHOLD = 2000
+CHUNK_SIZE = 500
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(text):
+    """统一大小写和空白，并去掉结尾的标点，用于发现只差一个问号之类的重复问题"""
+    return _WHITESPACE.sub(" ", text).strip().rstrip("?？.。!！ ").lower()
+
+
+def default_index_path(directory):
+    directory = os.path.normpath(directory)
+    return os.path.join(os.path.dirname(directory), f".{os.path.basename(directory)}_index.json")
+
+
+def read_text_files(paths):
+    """读取一批文件，返回 [(内容, 错误信息)]，在子进程中执行"""
+    results = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                results.append((file.read().strip(), None))
+        except (UnicodeDecodeError, OSError) as e:
+            results.append((None, str(e)))
+    return results
+
+
+class QAIndex:
+    """文件内容 -> 文件名 的倒排索引，同时维护归一化后的问题 -> 文件名"""
+
+    def __init__(self, directory, index_path=None, max_workers=None):
+        self.directory = directory
+        self.index_path = index_path or default_index_path(directory)
+        self.max_workers = max_workers
+        self.files = {}  # 文件名 -> [mtime_ns, size, 内容, 错误信息]
+        self._by_text = defaultdict(set)
+        self._by_normalized = defaultdict(set)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != INDEX_VERSION:
+            return
+        for filename, entry in data.get("files", {}).items():
+            self._add(filename, entry)
+
+    def save(self):
+        data = {"version": INDEX_VERSION, "files": self.files}
+        atomic_write_text(self.index_path, json.dumps(data, ensure_ascii=False))
+
+    def _add(self, filename, entry):
+        self.files[filename] = entry
+        text = entry[2]
+        if text is not None:
+            self._by_text[text].add(filename)
+            self._by_normalized[normalize_question(text)].add(filename)
+
+    def _remove(self, filename):
+        entry = self.files.pop(filename, None)
+        if entry is None or entry[2] is None:
+            return
+        text = entry[2]
+        for mapping, key in ((self._by_text, text), (self._by_normalized, normalize_question(text))):
+            names = mapping.get(key)
+            if names is not None:
+                names.discard(filename)
+                if not names:
+                    del mapping[key]
+
+    def update(self):
+        """重新读取新增或修改过的文件，删除已不存在的文件，返回重新读取的文件数"""
+        current = {}
+        if os.path.isdir(self.directory):
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".txt") and entry.is_file():
+                        stat = entry.stat()
+                        current[entry.name] = (stat.st_mtime_ns, stat.st_size)
+
+        removed = [name for name in self.files if name not in current]
+        for filename in removed:
+            self._remove(filename)
+
+        changed = [name for name, (mtime, size) in current.items()
+                   if name not in self.files or self.files[name][0] != mtime or self.files[name][1] != size]
+        if not changed:
+            # 只删除了文件时也要写回索引文件，否则下次加载时被删除的文件还在索引中
+            if removed:
+                self.save()
+            return 0
+
+        paths = [os.path.join(self.directory, name) for name in changed]
+        if len(paths) >= PARALLEL_THRESHOLD:
+            chunks = [paths[i:i + CHUNK_SIZE] for i in range(0, len(paths), CHUNK_SIZE)]
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                results = [result for chunk in executor.map(read_text_files, chunks) for result in chunk]
+        else:
+            results = read_text_files(paths)
+
+        for filename, (text, error) in zip(changed, results):
+            self._remove(filename)
+            mtime, size = current[filename]
+            self._add(filename, [mtime, size, text, error])
+        self.save()
+        return len(changed)
+
+    def counts(self, normalized=False):
+        """{内容: 文件数}"""
+        mapping = self._by_normalized if normalized else self._by_text
+        return {text: len(names) for text, names in mapping.items()}
+
+    def errors(self):
+        """无法读取的文件 [(文件名, 错误信息)]"""
+        return sorted((filename, entry[3]) for filename, entry in self.files.items() if entry[3] is not None)
+
+    def lookup(self, text, normalized=False):
+        if normalized:
+            return sorted(self._by_normalized.get(normalize_question(text), ()))
+        return sorted(self._by_text.get(text, ()))
+
+    def replace(self, old_text, new_text):
+        """把内容等于 old_text 的文件改写为 new_text，返回被修改的文件名"""
+        modified = []
+        for filename in self.lookup(old_text):
+            path = os.path.join(self.directory, filename)
+            atomic_write_text(path, new_text + "\n")
+            stat = os.stat(path)
+            self._remove(filename)
+            self._add(filename, [stat.st_mtime_ns, stat.st_size, new_text, None])
+            modified.append(filename)
+        if modified:
+            self.save()
+        return modified
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="统计、查找和替换问题/答案")
+    parser.add_argument("root", help="Questions/Answers 所在的目录")
+    parser.add_argument("--answers", action="store_true", help="对 Answers 文件夹操作，默认为 Questions")
+    parser.add_argument("--workers", type=int, default=None, help="读取文件的进程数")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("update", help="只更新索引")
+    count_parser = subparsers.add_parser("count", help="统计每个问题出现的次数")
+    count_parser.add_argument("--normalized", action="store_true", help="按归一化后的问题统计")
+    find_parser = subparsers.add_parser("find", help="查找内容为指定问题的文件")
+    find_parser.add_argument("text")
+    find_parser.add_argument("--normalized", action="store_true", help="按归一化后的问题匹配")
+    replace_parser = subparsers.add_parser("replace", help="替换内容完全相同的问题")
+    replace_parser.add_argument("old_text")
+    replace_parser.add_argument("new_text")
+    args = parser.parse_args(argv)
+
+    directory = os.path.join(args.root, "Answers" if args.answers else "Questions")
+    start = time.perf_counter()
+    index = QAIndex(directory, max_workers=args.workers)
+    reread = index.update()
+    print(f"索引已更新: {len(index.files)} 个文件，重新读取 {reread} 个，用时 {time.perf_counter() - start:.2f}s")
+
+    if args.command == "count":
+        for text, count in sorted(index.counts(args.normalized).items(), key=lambda item: -item[1]):
+            print(f"{count}\t{text}")
+        for filename, error in index.errors():
+            print(f"无法读取 {filename}: {error}")
+    elif args.command == "find":
+        for filename in index.lookup(args.text, args.normalized):
+            print(filename)
+    elif args.command == "replace":
+        modified = index.replace(args.old_text, args.new_text)
+        print(f"已修改 {len(modified)} 个文件")
+        for filename in modified:
+            print(filename)
+
+
+if __name__ == "__main__":
+    main()
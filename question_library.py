@@ -0,0 +1,149 @@
+import heapq
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from qa_index import normalize_question
+
+NGRAM_SIZE = 3
+# 模糊匹配时最多累加多少条 n-gram 倒排记录，从最少见的 n-gram 开始
+POSTING_BUDGET = 20000
+# 按重合的 n-gram 数量取前多少个候选计算相似度
+CANDIDATE_COUNT = 50
+# 出现次数最多的这些问题总是作为候选，常见问题的近似写法总能被找到
+FREQUENT_COUNT = 100
+# 前缀范围超过这个数量时，改为按出现次数从高到低查找
+SCAN_LIMIT = 2000
+MIN_SIMILARITY = 0.5
+
+
+def ngrams(text):
+    padded = f" {text} "
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+class QuestionLibrary:
+    """已有问题的前缀补全和相似问题查找，用于输入问题时的自动补全
+
+    问题按 normalize_question 归一化后合并，同一个归一化问题返回出现次数最多的原始写法。
+    前缀查找使用排好序的归一化问题列表（相当于展开的 trie，用 bisect 找到前缀对应的区间），
+    相似查找使用 n-gram 倒排索引。
+    """
+
+    def __init__(self, counts=None):
+        self.variants = defaultdict(Counter)  # 归一化问题 -> {原始写法: 次数}
+        self.totals = {}  # 归一化问题 -> 总次数
+        self.keys = []  # 排好序的归一化问题
+        self.by_count = []  # (-总次数, 归一化问题)，从多到少
+        self.grams = defaultdict(set)  # n-gram -> 归一化问题
+        if counts:
+            self._build(counts)
+
+    def __len__(self):
+        return len(self.totals)
+
+    def _build(self, counts):
+        for question, count in counts.items():
+            key = normalize_question(question)
+            if key:
+                self.variants[key][question.strip()] += count
+        for key, variants in self.variants.items():
+            self.totals[key] = sum(variants.values())
+            for gram in ngrams(key):
+                self.grams[gram].add(key)
+        self.keys = sorted(self.totals)
+        self.by_count = sorted((-total, key) for key, total in self.totals.items())
+
+    def canonical(self, key):
+        """归一化问题出现次数最多的原始写法"""
+        return self.variants[key].most_common(1)[0][0]
+
+    def add(self, question, count=1):
+        """保存标注后更新，count 为负数时表示这个问题被替换掉了"""
+        key = normalize_question(question)
+        if not key:
+            return
+        old_total = self.totals.get(key)
+        variants = self.variants[key]
+        variants[question.strip()] += count
+        self.variants[key] = variants = +variants  # 去掉次数不大于 0 的写法
+        total = sum(variants.values())
+
+        if old_total is not None:
+            del self.by_count[bisect_left(self.by_count, (-old_total, key))]
+        if total <= 0:
+            if old_total is not None:
+                del self.totals[key]
+                del self.keys[bisect_left(self.keys, key)]
+                for gram in ngrams(key):
+                    self.grams[gram].discard(key)
+            del self.variants[key]
+            return
+        if old_total is None:
+            insort(self.keys, key)
+            for gram in ngrams(key):
+                self.grams[gram].add(key)
+        self.totals[key] = total
+        insort(self.by_count, (-total, key))
+
+    def replace(self, old_question, new_question):
+        if normalize_question(old_question or "") == normalize_question(new_question or ""):
+            return
+        if old_question:
+            self.add(old_question, -1)
+        if new_question:
+            self.add(new_question)
+
+    def complete(self, prefix, limit=8):
+        """以 prefix 开头的问题，出现次数多的在前"""
+        prefix = normalize_question(prefix) if prefix.strip() else ""
+        if not prefix:
+            return []
+        start = bisect_left(self.keys, prefix)
+        stop = bisect_left(self.keys, prefix + "\uffff", start)
+        if stop - start <= SCAN_LIMIT:
+            keys = heapq.nsmallest(limit, self.keys[start:stop], key=lambda key: (-self.totals[key], key))
+        else:
+            # 区间很大说明前缀很常见，按次数从高到低很快就能找到足够的问题
+            keys = []
+            for _, key in self.by_count:
+                if key.startswith(prefix):
+                    keys.append(key)
+                    if len(keys) >= limit:
+                        break
+        return [self.canonical(key) for key in keys]
+
+    def similar(self, text, limit=8, min_similarity=MIN_SIMILARITY):
+        """与 text 相似的问题（n-gram 的 Dice 系数），相似度高的在前"""
+        key = normalize_question(text)
+        if len(key) <= NGRAM_SIZE:
+            return []
+        query = ngrams(key)
+        overlaps = Counter()
+        budget = POSTING_BUDGET
+        for posting in sorted((self.grams[gram] for gram in query if gram in self.grams), key=len):
+            if len(posting) > budget:
+                break
+            overlaps.update(posting)
+            budget -= len(posting)
+        candidates = {candidate for candidate, _ in heapq.nlargest(CANDIDATE_COUNT, overlaps.items(),
+                                                                   key=itemgetter(1))}
+        candidates.update(key for _, key in self.by_count[:FREQUENT_COUNT])
+        scored = []
+        for candidate in candidates:
+            grams = ngrams(candidate)
+            score = 2 * len(query & grams) / (len(query) + len(grams))
+            if score >= min_similarity:
+                scored.append((-score, -self.totals[candidate], candidate))
+        return [self.canonical(candidate) for _, _, candidate in heapq.nsmallest(limit, scored)]
+
+    def suggest(self, text, limit=8):
+        """先给出前缀补全，不够时补充相似的问题"""
+        results = self.complete(text, limit)
+        if len(results) < limit:
+            for question in self.similar(text, limit):
+                if question not in results:
+                    results.append(question)
+                    if len(results) >= limit:
+                        break
+        return results
@@ -0,0 +1,110 @@
+import getpass
+import json
+import os
+import socket
+import threading
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from annotation_store import AnnotationStore, Annotation, format_labels
+from label_store import parse_label_lines
+
+REQUEST_TIMEOUT = 10
+
+
+class ConflictError(Exception):
+    """保存时发现标注已被别人修改"""
+
+
+class LeaseError(Exception):
+    """图像正在被别人标注"""
+
+    def __init__(self, name, holder):
+        super().__init__(f"{name} 正在被 {holder} 标注")
+        self.holder = holder
+
+
+def default_client_id():
+    return f"{getpass.getuser()}@{socket.gethostname()}:{os.getpid()}"
+
+
+class RemoteAnnotationStore(AnnotationStore):
+    """通过 annotation_server.py 读写标注
+
+    load 时记录每张图像的版本号，save 时一起提交；期间被别人修改过会抛出 ConflictError，
+    需要重新加载后再保存。可以在后台写入线程中使用。
+    """
+
+    def __init__(self, server_url, client_id=None):
+        self.server_url = server_url.rstrip("/")
+        self.client_id = client_id or default_client_id()
+        self._versions = {}  # 图像名 -> 最近一次读取或保存后的版本号
+        self._lock = threading.Lock()
+
+    def _request(self, method, path, payload=None):
+        data = None if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        request = Request(self.server_url + path, data=data, method=method,
+                          headers={"Content-Type": "application/json"})
+        try:
+            with urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+                return response.status, json.loads(response.read().decode('utf-8'))
+        except HTTPError as e:
+            return e.code, json.loads(e.read().decode('utf-8') or "{}")
+
+    def ping(self):
+        """检查服务是否可用，无法连接时抛出 OSError"""
+        status, data = self._request("GET", "/health")
+        if status != 200:
+            raise OSError(f"标注服务不可用: {data.get('error')}")
+
+    def load(self, name):
+        status, data = self._request("GET", f"/annotations/{quote(name)}")
+        if status != 200:
+            raise OSError(f"读取 {name} 失败: {data.get('error')}")
+        with self._lock:
+            self._versions[name] = data["version"]
+        if data["version"] is None:
+            return None
+        labels = None if data["labels"] is None else parse_label_lines(data["labels"].splitlines())
+        return Annotation(data["question"], data["answer"], labels)
+
+    def save(self, name, question, answer, labels):
+        with self._lock:
+            base_version = self._versions.get(name)
+        payload = {"client": self.client_id, "question": question, "answer": answer,
+                   "labels": None if labels is None else format_labels(labels), "base_version": base_version}
+        status, data = self._request("PUT", f"/annotations/{quote(name)}", payload)
+        if status == 409:
+            raise ConflictError(f"{name} 已被其他人修改，请重新加载后再保存")
+        if status == 423:
+            raise LeaseError(name, data.get("holder"))
+        if status != 200:
+            raise OSError(f"保存 {name} 失败: {data.get('error')}")
+        with self._lock:
+            self._versions[name] = data["version"]
+
+    def names(self):
+        status, data = self._request("GET", "/names")
+        if status != 200:
+            raise OSError(f"读取图像列表失败: {data.get('error')}")
+        return data["names"]
+
+    def acquire(self, name):
+        """租用一张图像（已租用时续租），被别人租用时抛出 LeaseError"""
+        status, data = self._request("POST", f"/leases/{quote(name)}", {"client": self.client_id})
+        if status == 423:
+            raise LeaseError(name, data.get("holder"))
+        if status != 200:
+            raise OSError(f"租用 {name} 失败: {data.get('error')}")
+        return data["expires"]
+
+    def release(self, name):
+        self._request("DELETE", f"/leases/{quote(name)}?client={quote(self.client_id)}")
+
+    def claim(self, count=10):
+        """领取下一批没有标注、也没有被别人租用的图像"""
+        status, data = self._request("POST", "/claim", {"client": self.client_id, "count": count})
+        if status != 200:
+            raise OSError(f"领取图像失败: {data.get('error')}")
+        return data["names"]
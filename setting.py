@@ -1,10 +1,11 @@
 import json
 import os
 
+from atomic_io import atomic_write_text
+
 def save_settings(settings, filename='settings.json'):
-    """将用户设置保存到JSON文件"""
-    with open(filename, 'w') as f:
-        json.dump(settings, f)
+    """将用户设置保存到JSON文件（先写临时文件再替换，避免写到一半的文件）"""
+    atomic_write_text(filename, json.dumps(settings))
 
 def load_settings():
     settings_path = 'settings.json'  # 你的设置文件路径
@@ -13,7 +14,9 @@ def load_settings():
         return {
             'rope3d_path': '',
             'image_folder': '',
-            'last_file_name': ''
+            'last_file_name': '',
+            'storage_backend': 'txt',
+            'server_url': ''
         }
     else:
         with open(settings_path, 'r') as f:
@@ -24,5 +27,7 @@ def load_settings():
                 return {
                     'rope3d_path': '',
                     'image_folder': '',
-                    'last_file_name': ''
+                    'last_file_name': '',
+                    'storage_backend': 'txt',
+                    'server_url': ''
                 }
@@ -0,0 +1,129 @@
+from PIL import Image
+
+from image_cache import decode_full_resolution
+
+# 最大放大倍数（画布像素 / 原图像素）
+MAX_ZOOM = 8.0
+ZOOM_STEP = 1.25
+
+
+class Viewport:
+    """画布上显示的原图区域，不依赖 Tk
+
+    zoom 为画布像素 / 原图像素，offset 为画布左上角对应的原图坐标：
+        画布 x = (原图 x - offset_x) * zoom
+    宽高使用同一个缩放比例，不会拉伸图像。
+    """
+
+    def __init__(self, image_width, image_height, canvas_width, canvas_height):
+        self.image_width = image_width
+        self.image_height = image_height
+        self.canvas_width = canvas_width
+        self.canvas_height = canvas_height
+        self.fit_zoom = min(canvas_width / image_width, canvas_height / image_height)
+        self.zoom = self.fit_zoom
+        self.offset_x = 0.0
+        self.offset_y = 0.0
+        self.fit()
+
+    def fit(self):
+        """整张图像居中显示"""
+        self.zoom = self.fit_zoom
+        self._clamp()
+
+    def is_fit(self):
+        return self.zoom <= self.fit_zoom
+
+    def to_image(self, x, y):
+        return self.offset_x + x / self.zoom, self.offset_y + y / self.zoom
+
+    def zoom_at(self, factor, x, y):
+        """以画布上的点 (x, y) 为中心缩放，返回缩放比例是否变化"""
+        zoom = min(MAX_ZOOM, max(self.fit_zoom, self.zoom * factor))
+        if zoom == self.zoom:
+            return False
+        image_x, image_y = self.to_image(x, y)
+        self.zoom = zoom
+        self.offset_x = image_x - x / zoom
+        self.offset_y = image_y - y / zoom
+        self._clamp()
+        return True
+
+    def pan(self, dx, dy):
+        """按画布像素平移，返回位置是否变化"""
+        old = (self.offset_x, self.offset_y)
+        self.offset_x -= dx / self.zoom
+        self.offset_y -= dy / self.zoom
+        self._clamp()
+        return (self.offset_x, self.offset_y) != old
+
+    def _clamp(self):
+        # 图像比可见区域小的方向居中，否则不能拖出图像边界
+        for axis in ("x", "y"):
+            image_size = self.image_width if axis == "x" else self.image_height
+            view_size = (self.canvas_width if axis == "x" else self.canvas_height) / self.zoom
+            if view_size >= image_size:
+                offset = (image_size - view_size) / 2
+            else:
+                offset = min(max(getattr(self, f"offset_{axis}"), 0.0), image_size - view_size)
+            setattr(self, f"offset_{axis}", offset)
+
+    def visible_rect(self):
+        """可见的原图区域 (x1, y1, x2, y2)，已限制在图像范围内"""
+        x1 = max(0.0, self.offset_x)
+        y1 = max(0.0, self.offset_y)
+        x2 = min(float(self.image_width), self.offset_x + self.canvas_width / self.zoom)
+        y2 = min(float(self.image_height), self.offset_y + self.canvas_height / self.zoom)
+        return x1, y1, x2, y2
+
+
+class ImagePyramid:
+    """原图以及每次缩小一半的各级图像，放大时只裁剪、缩放可见区域
+
+    nbytes 用于放入 ImageCache。
+    """
+
+    def __init__(self, levels):
+        self.levels = levels  # levels[k] 为原图缩小 2**k 倍
+        self.width, self.height = levels[0].size
+        self.nbytes = sum(level.width * level.height * 3 for level in levels)
+
+    @classmethod
+    def build(cls, image, min_size):
+        """从原图开始逐级缩小，直到宽或高不大于 min_size 对应的尺寸"""
+        levels = [image]
+        min_width, min_height = min_size
+        while levels[-1].width // 2 >= min_width and levels[-1].height // 2 >= min_height:
+            levels.append(levels[-1].reduce(2))
+        return cls(levels)
+
+    @classmethod
+    def load(cls, image_path, min_size):
+        """解码原图并生成金字塔，失败时返回 None（在后台线程中调用）"""
+        image = decode_full_resolution(image_path)
+        return None if image is None else cls.build(image, min_size)
+
+    def render(self, viewport):
+        return render_region(self.levels, viewport)
+
+
+def render_region(levels, viewport, resample=Image.Resampling.BILINEAR):
+    """裁剪可见区域并缩放到画布，返回 (PIL 图像, 画布 x, 画布 y)
+
+    levels[k] 可以是任意比例缩小的图像，按宽度换算比例。
+    """
+    x1, y1, x2, y2 = viewport.visible_rect()
+    output_width = max(1, round((x2 - x1) * viewport.zoom))
+    output_height = max(1, round((y2 - y1) * viewport.zoom))
+    # 选择宽度不小于所需像素数的最小一级
+    source = levels[0]
+    for level in levels:
+        # 允许 1 像素的取整误差
+        if level.width >= viewport.image_width * viewport.zoom - 1:
+            source = level
+    factor = source.width / viewport.image_width
+    box = (x1 * factor, y1 * factor, x2 * factor, y2 * factor)
+    image = source.resize((output_width, output_height), resample, box=box)
+    canvas_x = round((x1 - viewport.offset_x) * viewport.zoom)
+    canvas_y = round((y1 - viewport.offset_y) * viewport.zoom)
+    return image, canvas_x, canvas_y